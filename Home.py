@@ -1,5 +1,7 @@
 import streamlit as st
 import time
+from eureka.debug import metrics_panel, resume_session, track_memory
+from eureka.session import restore_session, save_session
 
 
 @st.dialog("How Eureka works")
@@ -66,6 +68,10 @@ def initial_setup():
     
 
 def main():
+    # Restore a returning reader's profile, chat and progress
+    restore_session(st.session_state, st.query_params)
+    resume_session()
+
     # Check if this is the first visit
     if 'has_visited_home' not in st.session_state:
         st.session_state.has_visited_home = False
@@ -113,6 +119,11 @@ def main():
             # Navigate to the test knowledge page
             st.switch_page("pages/🧠Test_Knowledge.py")
 
+    # Persist any changes in the background
+    save_session(st.session_state)
+    track_memory()
+    metrics_panel()
+
 if __name__=="__main__":
     st.set_page_config(page_title="Eureka", page_icon="media/images/idea.png")
     main()
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""Rerun latency benchmark: drives each page headlessly through scripted interactions.
+
+Every page runs in its own interpreter with a throwaway data directory. A scenario is a
+list of steps; each step changes a widget (or nothing, for the first render) and then
+reruns the page with Streamlit's AppTest, timing the rerun. A scenario is repeated in a
+fresh session `--iterations` times, and the script reports p50/p95/p99 latency per step
+and per page plus the page process's peak memory (max RSS).
+
+    python benchmarks/reruns.py [--iterations 20] [--output FILE] [--compare FILE] [PAGE ...]
+
+Results are written as JSON (by default to .eureka/benchmarks/reruns-<commit>.json) so
+runs from different commits can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PDF = os.path.join(ROOT, "media", "docs", "toward-human-centered-algorithm-design-exploratory.pdf")
+PROFILE = {
+    "name": "Benchmark",
+    "familiar_subjects": ["AI & Labor", "Human-AI Interaction"],
+    "experience": "Intermediate",
+    "goals": "data privacy and the future of work",
+}
+
+
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def _with_profile(at):
+    at.session_state.user_profile = dict(PROFILE)
+    at.session_state.has_visited_home = True
+
+
+def _upload(at):
+    with open(SAMPLE_PDF, "rb") as f:
+        at.file_uploader[0].set_value(("paper.pdf", f.read(), "application/pdf"))
+
+
+def _select_passage(at):
+    # As a click on a highlight would; selections only exist once the upload is parsed
+    from eureka.ingest import get_ingestor
+
+    get_ingestor().get(at.session_state.paper_digest).done.wait(60)
+    at.session_state.selected_paragraph = (at.session_state.paper_digest, 0)
+
+
+def _answer_quiz(at):
+    for radio in at.radio:
+        radio.set_value(radio.options[0])
+    _button(at, "Submit Answers").click()
+
+
+# Each step is (name, action); the action runs before the timed rerun and may be None
+SCENARIOS = {
+    "Home.py": [
+        ("first visit", None),
+        ("returning reader", _with_profile),
+        ("help dialog", lambda at: _button(at, "❓").click()),
+        ("rerun", None),
+    ],
+    "pages/📄Read_Paper.py": [
+        ("first render", None),
+        ("upload paper", _upload),
+        ("exploratory mode", lambda at: at.segmented_control[0].set_value("Exploratory")),
+        ("understanding mode", lambda at: at.segmented_control[0].set_value("Understanding")),
+        ("chat prompt", lambda at: at.chat_input[0].set_value("What are the reading modes?")),
+        ("select passage", _select_passage),
+        ("explain selection", lambda at: _button(at, "Explain selected lines").click()),
+    ],
+    "pages/🧠Test_Knowledge.py": [
+        ("first render", None),
+        ("pick topic", lambda at: at.pills[0].set_value("AI & Labor")),
+        ("submit quiz", _answer_quiz),
+        ("adaptive quiz", lambda at: at.toggle[0].set_value(True)),
+        ("adaptive choice", lambda at: at.radio[0].set_value(at.radio[0].options[0])),
+        ("adaptive submit", lambda at: _button(at, "Submit Answer").click()),
+    ],
+    "pages/👤Profile.py": [
+        ("no profile", None),
+        ("profile", _with_profile),
+        ("rerun", None),
+    ],
+    "pages/Additional_Features.py": [
+        ("recommendations", _with_profile),
+        ("generate recommendations", lambda at: (at.multiselect[0].set_value(["AI in Healthcare"]),
+                                                _button(at, "Generate Recommendations").click())),
+        ("analytics tab", lambda at: at.session_state.__setitem__("feature_tab", "Knowledge Analytics")),
+        ("collaboration tab", lambda at: at.session_state.__setitem__("feature_tab", "Collaboration")),
+    ],
+}
+
+
+def percentile(samples, q):
+    """The `q`-th percentile of `samples`, interpolating between the closest ranks."""
+    samples = sorted(samples)
+    rank = (len(samples) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (rank - low)
+
+
+def latency_stats(samples):
+    return {
+        "n": len(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples),
+    }
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process, or None where the platform can't tell."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(page, iterations):
+    """Run in a fresh interpreter: play `page`'s scenario `iterations` times and time every rerun."""
+    from streamlit.testing.v1 import AppTest
+
+    steps = SCENARIOS[page]
+    samples = {name: [] for name, _ in steps}
+    errors = []
+    for _ in range(iterations):
+        at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=60)
+        for name, action in steps:
+            if action is not None:
+                action(at)
+            start = time.perf_counter()
+            at.run()
+            samples[name].append((time.perf_counter() - start) * 1000)
+            errors.extend(f"{name}: {e.value}" for e in at.exception)
+    return {"samples": samples, "peak_memory_mb": peak_memory_mb(), "errors": sorted(set(errors))}
+
+
+def run_page(page, iterations):
+    with tempfile.TemporaryDirectory() as data_dir:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", page, "--iterations", str(iterations)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+            env=dict(os.environ, EUREKA_DATA_DIR=data_dir),
+        )
+    child = json.loads(out.stdout.strip().splitlines()[-1])
+    every = [ms for samples in child["samples"].values() for ms in samples]
+    return {
+        "reruns": latency_stats(every),
+        "steps": {name: latency_stats(samples) for name, samples in child["samples"].items()},
+        "peak_memory_mb": child["peak_memory_mb"],
+        "errors": child["errors"],
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return out.stdout.strip()
+
+
+def compare(results, baseline):
+    """Print how each page's and step's p50/p95 moved relative to `baseline`."""
+    print(f"\nCompared with {baseline['commit']}:")
+    for page, result in results["pages"].items():
+        before = baseline["pages"].get(page)
+        if before is None:
+            continue
+        rows = [("all reruns", result["reruns"], before["reruns"])]
+        rows += [(name, stats, before["steps"][name]) for name, stats in result["steps"].items() if name in before["steps"]]
+        print(page)
+        for name, now, then in rows:
+            print(f"  {name:28} p50 {now['p50_ms'] - then['p50_ms']:+8.1f} ms   p95 {now['p95_ms'] - then['p95_ms']:+8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="pages to measure, relative to the app root (default: all)")
+    parser.add_argument("--iterations", type=int, default=20, help="sessions played per page (default 20)")
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(measure(args.child, args.iterations)))
+        return 0
+
+    import streamlit
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "iterations": args.iterations,
+        "pages": {},
+    }
+    for page in args.pages or list(SCENARIOS):
+        result = results["pages"][page] = run_page(page, args.iterations)
+        reruns = result["reruns"]
+        memory = f"{result['peak_memory_mb']:.0f} MB" if result["peak_memory_mb"] is not None else "n/a"
+        print(f"{page:32} p50 {reruns['p50_ms']:7.1f} ms   p95 {reruns['p95_ms']:7.1f} ms   "
+              f"p99 {reruns['p99_ms']:7.1f} ms   peak memory {memory}")
+        for name, stats in result["steps"].items():
+            print(f"  {name:30} p50 {stats['p50_ms']:7.1f} ms   p95 {stats['p95_ms']:7.1f} ms   p99 {stats['p99_ms']:7.1f} ms")
+        for error in result["errors"]:
+            print(f"  error in {error}")
+
+    output = args.output or os.path.join(ROOT, os.environ.get("EUREKA_DATA_DIR", ".eureka"), "benchmarks", f"reruns-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    return 1 if any(r["errors"] for r in results["pages"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
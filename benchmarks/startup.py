@@ -0,0 +1,112 @@
+"""Cold-start and first-render benchmark for every page of the app.
+
+Each run starts a fresh interpreter, times `import streamlit` (cold start), then renders
+the page once headlessly with Streamlit's AppTest (first render) and records which heavy
+modules the page pulled in. Results are compared with `startup_budget.json`; the script
+exits non-zero when a page goes over its budget or eagerly imports a module it shouldn't.
+
+    python benchmarks/startup.py [--runs 5] [--json] [--budget FILE] [PAGE ...]
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+# Modules that are slow to import and should only load when a feature needs them
+HEAVY_MODULES = ["numpy", "pandas", "matplotlib", "pymupdf", "fitz", "streamlit_pdf_viewer"]
+
+
+def measure(page):
+    """Run in a fresh interpreter: time the cold import and the first render of `page`."""
+    start = time.perf_counter()
+    import streamlit  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+    cold_start = time.perf_counter() - start
+
+    before = {name for name in HEAVY_MODULES if name in sys.modules}
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=60)
+    start = time.perf_counter()
+    at.run()
+    first_render = time.perf_counter() - start
+
+    return {
+        "cold_start_ms": cold_start * 1000,
+        "first_render_ms": first_render * 1000,
+        "heavy_imports": sorted(name for name in HEAVY_MODULES if name in sys.modules and name not in before),
+        "exceptions": [e.value for e in at.exception],
+    }
+
+
+def run_page(page, runs):
+    """Measure `page` `runs` times, each in its own process, and keep the medians."""
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", page],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "page": page,
+        "runs": runs,
+        "cold_start_ms": statistics.median(s["cold_start_ms"] for s in samples),
+        "first_render_ms": statistics.median(s["first_render_ms"] for s in samples),
+        "heavy_imports": sorted({name for s in samples for name in s["heavy_imports"]}),
+        "exceptions": sorted({e for s in samples for e in s["exceptions"]}),
+    }
+
+
+def check(result, budget):
+    """List how `result` breaks its page's budget."""
+    limits = dict(budget.get("default", {}), **budget.get("pages", {}).get(result["page"], {}))
+    problems = []
+    for metric in ("cold_start_ms", "first_render_ms"):
+        if metric in limits and result[metric] > limits[metric]:
+            problems.append(f"{metric} {result[metric]:.0f} > {limits[metric]}")
+    eager = sorted(set(result["heavy_imports"]) & set(limits.get("forbidden_imports", [])))
+    if eager:
+        problems.append(f"imports {', '.join(eager)} on first render")
+    if result["exceptions"]:
+        problems.append("raised an exception")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="pages to measure, relative to the app root (default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per page (default 5)")
+    parser.add_argument("--budget", default=DEFAULT_BUDGET, help="budget file (default benchmarks/startup_budget.json)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(measure(args.child)))
+        return 0
+
+    pages = args.pages or ["Home.py"] + sorted(os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, "pages", "*.py")))
+    with open(args.budget, encoding="utf-8") as f:
+        budget = json.load(f)
+
+    results = []
+    for page in pages:
+        result = run_page(page, args.runs)
+        result["problems"] = check(result, budget)
+        results.append(result)
+        if not args.json:
+            status = "FAIL " + "; ".join(result["problems"]) if result["problems"] else "ok"
+            print(f"{page:40} cold start {result['cold_start_ms']:7.0f} ms   first render {result['first_render_ms']:7.0f} ms   {status}")
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    return 1 if any(r["problems"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
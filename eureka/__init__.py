@@ -0,0 +1 @@
+"""Shared, process-wide services behind the Eureka Streamlit pages."""
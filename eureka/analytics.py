@@ -0,0 +1,160 @@
+"""Reading and quiz activity as a compact time series with incremental aggregates.
+
+Events are appended to growable NumPy columns (timestamp, kind, topic, value). Weekly and
+monthly totals are updated as each event arrives, so the analytics charts never rescan
+the event history. Rendered charts are memoised per aggregate version: a rerun with no new
+activity returns the previous PNG without touching matplotlib.
+"""
+import numpy as np
+
+from eureka.charts import render_png
+from eureka.knowledge import TOPIC_INDEX
+from eureka.store import get_store
+
+READ, QUIZ = 0, 1
+WORDS_PER_MINUTE = 200
+# Aggregate columns: papers read, reading minutes, quizzes taken, sum of quiz scores
+PAPERS, MINUTES, QUIZZES, SCORE = range(4)
+_SECONDS_PER_DAY = 86400
+
+
+def reading_minutes(word_count):
+    """Estimated time to read `word_count` words."""
+    return word_count / WORDS_PER_MINUTE
+
+
+def _week_start(day):
+    # 1970-01-01 was a Thursday; weeks start on Monday.
+    return day - (day + 3) % 7
+
+
+class EventLog:
+    """Append-only activity log for one reader."""
+
+    def __init__(self, capacity=64):
+        self.time = np.empty(capacity, dtype=np.int64)
+        self.kind = np.empty(capacity, dtype=np.uint8)
+        self.topic = np.empty(capacity, dtype=np.int8)
+        self.value = np.empty(capacity, dtype=np.float32)
+        self.n = 0
+        self.version = 0
+        self.weekly = {}  # first day of week (days since epoch) -> aggregate row
+        self.monthly = {}  # months since epoch -> aggregate row
+        self._charts = {}  # chart kind -> (version, png)
+
+    def __len__(self):
+        return self.n
+
+    def record(self, kind, value=0.0, topic=None, when=None):
+        """Append an event at `when` (epoch seconds, default now) and update the aggregates."""
+        if when is None:
+            when = int(np.datetime64("now", "s").astype(np.int64))
+        if self.n == len(self.time):
+            for column in ("time", "kind", "topic", "value"):
+                old = getattr(self, column)
+                grown = np.empty(2 * len(old), dtype=old.dtype)
+                grown[:self.n] = old
+                setattr(self, column, grown)
+        self.time[self.n] = when
+        self.kind[self.n] = kind
+        self.topic[self.n] = TOPIC_INDEX.get(topic, -1)
+        self.value[self.n] = value
+        self.n += 1
+
+        day = when // _SECONDS_PER_DAY
+        month = int(np.datetime64(day, "D").astype("datetime64[M]").astype(np.int64))
+        for buckets, key in ((self.weekly, _week_start(day)), (self.monthly, month)):
+            row = buckets.setdefault(key, np.zeros(4))
+            if kind == READ:
+                row[PAPERS] += 1
+                row[MINUTES] += value
+            else:
+                row[QUIZZES] += 1
+                row[SCORE] += value
+        self.version += 1
+
+    def record_reading(self, minutes, topic=None, when=None):
+        self.record(READ, minutes, topic, when)
+
+    def record_quiz(self, score, topic=None, when=None):
+        """Record a quiz result; `score` is the fraction answered correctly."""
+        self.record(QUIZ, score, topic, when)
+
+    def rows(self, start=0):
+        """(time, kind, topic, value) tuples of the events from number `start` on, for the store."""
+        columns = (getattr(self, c)[start:self.n].tolist() for c in ("time", "kind", "topic", "value"))
+        return list(zip(*columns))
+
+    @classmethod
+    def from_rows(cls, rows):
+        log = cls(capacity=max(64, len(rows)))
+        topics = {i: t for t, i in TOPIC_INDEX.items()}
+        for when, kind, topic, value in rows:
+            log.record(kind, value, topics.get(topic), when)
+        return log
+
+    def weekly_series(self):
+        """(week start dates, aggregate rows) in date order."""
+        weeks = np.array(sorted(self.weekly), dtype=np.int64)
+        rows = np.array([self.weekly[w] for w in weeks]).reshape(-1, 4)
+        return weeks.astype("datetime64[D]"), rows
+
+    def summary(self):
+        """Headline numbers for the analytics metrics."""
+        this_month = int(np.datetime64("today", "M").astype(np.int64))
+        current = self.monthly.get(this_month, np.zeros(4))
+        previous = self.monthly.get(this_month - 1, np.zeros(4))
+        totals = sum(self.monthly.values(), np.zeros(4))
+        first = self.monthly[min(self.monthly)] if self.monthly else np.zeros(4)
+        score = lambda row: float(100 * row[SCORE] / row[QUIZZES]) if row[QUIZZES] else None
+        return {
+            "papers_this_month": int(current[PAPERS]),
+            "papers_last_month": int(previous[PAPERS]),
+            "average_reading_minutes": float(totals[MINUTES] / totals[PAPERS]) if totals[PAPERS] else None,
+            "average_reading_minutes_this_month": float(current[MINUTES] / current[PAPERS]) if current[PAPERS] else None,
+            "knowledge_score": score(totals),
+            "initial_knowledge_score": score(first),
+        }
+
+    def _chart(self, kind, draw):
+        cached = self._charts.get(kind)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        weeks, rows = self.weekly_series()
+        data = weeks.astype(np.int64).tobytes() + rows.tobytes()
+        png = render_png(kind, data, lambda fig: draw(fig, weeks, rows), figsize=(10, 5))
+        self._charts[kind] = (self.version, png)
+        return png
+
+    def reading_activity_chart(self):
+        """PNG of cumulative papers read per week."""
+        def draw(fig, weeks, rows):
+            ax = fig.add_subplot()
+            ax.plot(weeks, np.cumsum(rows[:, PAPERS]), marker="o")
+            ax.set_xlabel("Date")
+            ax.set_ylabel("Cumulative Papers Read")
+            ax.grid(True, linestyle="--", alpha=0.7)
+            fig.autofmt_xdate()
+        return self._chart("reading-activity", draw)
+
+    def knowledge_growth_chart(self):
+        """PNG of the average quiz score per week."""
+        def draw(fig, weeks, rows):
+            ax = fig.add_subplot()
+            quizzed = rows[:, QUIZZES] > 0
+            ax.plot(weeks[quizzed], 100 * rows[quizzed, SCORE] / rows[quizzed, QUIZZES], marker="o", color="green")
+            ax.set_xlabel("Date")
+            ax.set_ylabel("Knowledge Score")
+            ax.set_ylim(0, 100)
+            ax.grid(True, linestyle="--", alpha=0.7)
+            fig.autofmt_xdate()
+        return self._chart("knowledge-growth", draw)
+
+
+def session_analytics(state):
+    """Return the reader's EventLog from Streamlit session state, loaded from the store the first time."""
+    if "analytics" not in state:
+        rows = get_store().events(state["uid"]) if "uid" in state else []
+        state["analytics"] = EventLog.from_rows(rows)
+        state["_saved_events"] = len(rows)  # events from here on are appended by save_session
+    return state["analytics"]
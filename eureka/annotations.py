@@ -0,0 +1,176 @@
+"""Columnar, spatially indexed storage for highlight rectangles.
+
+The annotation files are flat JSON lists of `{page, x, y, width, height, color, border}`
+rectangles. `AnnotationStore` keeps them as float32 coordinate columns with interned color
+and border strings, plus a per-page index sorted by `y` for point and region queries. The
+store can be written to a `.npz` file that loads straight into arrays without JSON parsing:
+
+    python -m eureka.annotations annotations/*.json
+"""
+import io
+import os
+import sys
+
+import numpy as np
+
+from eureka.assets import FrozenDict
+
+FORMAT_VERSION = 1
+_COLUMNS = ("page", "x", "y", "width", "height", "color", "border")
+
+
+class AnnotationStore:
+    """Immutable set of annotation rectangles with a per-page spatial index."""
+
+    def __init__(self, page, x, y, width, height, color, border, colors, borders, digest=None):
+        self.page = np.ascontiguousarray(page, dtype=np.int32)
+        self.x = np.ascontiguousarray(x, dtype=np.float32)
+        self.y = np.ascontiguousarray(y, dtype=np.float32)
+        self.width = np.ascontiguousarray(width, dtype=np.float32)
+        self.height = np.ascontiguousarray(height, dtype=np.float32)
+        self.color = np.ascontiguousarray(color, dtype=np.uint16)
+        self.border = np.ascontiguousarray(border, dtype=np.uint8)
+        self.colors = tuple(colors)
+        self.borders = tuple(borders)
+        self.digest = digest
+        self._records = None
+        for column in _COLUMNS:
+            getattr(self, column).flags.writeable = False
+        self._build_index()
+
+    def _build_index(self):
+        # Rectangles ordered by (page, y); each page is a contiguous run of that order.
+        self._order = np.lexsort((self.y, self.page))
+        sorted_pages = self.page[self._order]
+        self._sorted_y = self.y[self._order]
+        self._index_pages, starts = np.unique(sorted_pages, return_index=True)
+        self._index_bounds = np.append(starts, len(sorted_pages))
+        if len(sorted_pages):
+            # Tallest rectangle per page bounds how far above a query a hit can start.
+            self._index_max_height = np.maximum.reduceat(self.height[self._order], starts)
+        else:
+            self._index_max_height = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.page)
+
+    def __iter__(self):
+        return iter(self.records())
+
+    def close(self):
+        pass
+
+    @property
+    def size(self):
+        """Approximate memory footprint in bytes."""
+        return sum(getattr(self, c).nbytes for c in _COLUMNS) + self._order.nbytes + self._sorted_y.nbytes
+
+    @property
+    def pages(self):
+        """Page numbers that carry at least one rectangle."""
+        return self._index_pages
+
+    @classmethod
+    def from_records(cls, records, digest=None):
+        """Build a store from a list of annotation dicts in the JSON schema."""
+        colors, borders = {}, {}
+        n = len(records)
+        columns = {c: np.empty(n, dtype=np.float32) for c in ("x", "y", "width", "height")}
+        page = np.empty(n, dtype=np.int32)
+        color = np.empty(n, dtype=np.uint16)
+        border = np.empty(n, dtype=np.uint8)
+        for i, r in enumerate(records):
+            page[i] = r["page"]
+            for c, values in columns.items():
+                values[i] = r[c]
+            color[i] = colors.setdefault(r.get("color", ""), len(colors))
+            border[i] = borders.setdefault(r.get("border", ""), len(borders))
+        return cls(page, color=color, border=border, colors=colors, borders=borders, digest=digest, **columns)
+
+    @classmethod
+    def load(cls, path, digest=None):
+        """Load a `.json` annotation list or a `.npz` file written by `save`."""
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read(), binary=path.endswith(".npz"), digest=digest)
+
+    @classmethod
+    def from_bytes(cls, data, binary=False, digest=None):
+        """Build a store from the raw content of a `.json` or (if `binary`) `.npz` file."""
+        if not binary:
+            import json
+
+            return cls.from_records(json.loads(data), digest=digest)
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            if int(arrays["version"]) != FORMAT_VERSION:
+                raise ValueError(f"unsupported annotation format {int(arrays['version'])}")
+            return cls(
+                *(arrays[c] for c in _COLUMNS),
+                colors=arrays["colors"].tolist(),
+                borders=arrays["borders"].tolist(),
+                digest=digest,
+            )
+
+    def save(self, path):
+        """Write the store as an uncompressed `.npz` file."""
+        np.savez(
+            path,
+            version=np.int32(FORMAT_VERSION),
+            colors=np.array(self.colors, dtype=str),
+            borders=np.array(self.borders, dtype=str),
+            **{c: getattr(self, c) for c in _COLUMNS},
+        )
+
+    def records(self):
+        """Return the rectangles as read-only dicts in the JSON schema, in original order."""
+        if self._records is None:
+            self._records = tuple(self.record(i) for i in range(len(self)))
+        return self._records
+
+    def record(self, i):
+        return FrozenDict(
+            page=int(self.page[i]),
+            x=float(self.x[i]),
+            y=float(self.y[i]),
+            width=float(self.width[i]),
+            height=float(self.height[i]),
+            color=self.colors[self.color[i]],
+            border=self.borders[self.border[i]],
+        )
+
+    def on_page(self, page):
+        """Return the indices of the rectangles on `page`, ordered by `y`."""
+        k = np.searchsorted(self._index_pages, page)
+        if k == len(self._index_pages) or self._index_pages[k] != page:
+            return np.zeros(0, dtype=np.intp)
+        return self._order[self._index_bounds[k]:self._index_bounds[k + 1]]
+
+    def query_region(self, page, x0, y0, x1, y1):
+        """Return the indices of the rectangles on `page` that overlap the given box."""
+        k = np.searchsorted(self._index_pages, page)
+        if k == len(self._index_pages) or self._index_pages[k] != page:
+            return np.zeros(0, dtype=np.intp)
+        lo, hi = self._index_bounds[k], self._index_bounds[k + 1]
+        ys = self._sorted_y[lo:hi]
+        a = lo + np.searchsorted(ys, y0 - self._index_max_height[k], side="left")
+        b = lo + np.searchsorted(ys, y1, side="right")
+        idx = self._order[a:b]
+        x, y = self.x[idx], self.y[idx]
+        hit = (x <= x1) & (x + self.width[idx] >= x0) & (y <= y1) & (y + self.height[idx] >= y0)
+        return idx[hit]
+
+    def query_point(self, page, x, y):
+        """Return the indices of the rectangles on `page` that contain the point (x, y)."""
+        return self.query_region(page, x, y, x, y)
+
+
+def main(paths):
+    """Convert JSON annotation files to `.npz` next to the originals."""
+    for path in paths:
+        store = AnnotationStore.load(path)
+        out = os.path.splitext(path)[0] + ".npz"
+        store.save(out)
+        print(f"{path} -> {out} ({len(store)} rectangles)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
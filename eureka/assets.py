@@ -0,0 +1,231 @@
+"""Process-wide, content-addressed cache for the PDFs and annotation files read by the pages.
+
+Every Streamlit session runs the page script in the same process, so the cache lives at
+module level and is shared by all of them. Entries are keyed by the SHA-256 of the file
+content: two paths with identical bytes share one entry, and a file whose mtime or size
+changes on disk is re-hashed and re-loaded on the next access.
+"""
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from eureka import metrics
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class FrozenDict(dict):
+    """A dict that refuses mutation, so cached records can be shared between sessions."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached assets are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __hash__(self):
+        return hash(tuple(sorted(self.items())))
+
+
+def hash_bytes(data):
+    """Return the hex SHA-256 of a bytes-like object."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class PdfAsset:
+    """A memory-mapped PDF. `view` is zero-copy; `data` materialises one shared bytes copy.
+
+    The copy counts towards the cache budget from the moment it is made, and is dropped
+    when the asset leaves the cache.
+    """
+
+    def __init__(self, digest, mm):
+        self.digest = digest
+        self._mmap = mm
+        self.view = memoryview(mm).toreadonly()
+        self._data = None
+        self._charge = None  # set by the cache holding this asset, to count the bytes copy
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.view) + (len(self._data) if self._data is not None else 0)
+
+    @property
+    def data(self):
+        # pdf_viewer only accepts real `bytes`, so build them once for the whole process.
+        data = self._data
+        if data is None:
+            with self._lock:
+                data = self._data
+                if data is None:
+                    data = self._data = bytes(self.view)
+                    charge = self._charge
+                else:
+                    charge = None
+            if charge is not None:
+                charge(len(data))
+        return data
+
+    def _forget_copy(self):
+        # Sessions still holding the bytes keep them; the next reader gets a fresh copy
+        with self._lock:
+            self._charge = None
+            self._data = None
+
+    def close(self):
+        self.view.release()
+        self._mmap.close()
+
+
+class AssetCache:
+    """Size-bounded LRU of PDF and annotation assets, keyed by content hash."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (kind, digest) -> asset
+        self._paths = {}  # (kind, abspath) -> (mtime_ns, size, digest)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def pdf(self, path):
+        """Return the PdfAsset for `path`."""
+        return self._get("pdf", path, self._load_pdf)
+
+    def annotations(self, path):
+        """Return the AnnotationStore loaded from the `.json` or `.npz` file at `path`."""
+        return self._get("annotations", path, self._load_annotations)
+
+    def digest(self, path):
+        """Return the content hash of `path` without loading it into the cache."""
+        stat = os.stat(path)
+        known = self._paths.get(("pdf", os.path.abspath(path)))
+        if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2]
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    def _get(self, kind, path, loader):
+        abspath = os.path.abspath(path)
+        stat = os.stat(abspath)
+        with self._lock:
+            known = self._paths.get((kind, abspath))
+            if known is not None:
+                if known[:2] == (stat.st_mtime_ns, stat.st_size):
+                    asset = self._entries.get((kind, known[2]))
+                    if asset is not None:
+                        self._entries.move_to_end((kind, known[2]))
+                        self.hits += 1
+                        metrics.count(f"assets.{kind}.hit")
+                        return asset
+                else:
+                    self.invalidations += 1
+                    self._drop_path(kind, abspath)
+
+        # Hash and load outside the lock so a slow disk does not stall other sessions.
+        with metrics.span(f"assets.{kind}.load"):
+            asset = loader(abspath)
+        with self._lock:
+            self._paths[(kind, abspath)] = (stat.st_mtime_ns, stat.st_size, asset.digest)
+            existing = self._entries.get((kind, asset.digest))
+            if existing is not None:
+                # Same content under another path, or a concurrent load won the race.
+                asset.close()
+                self._entries.move_to_end((kind, asset.digest))
+                self.hits += 1
+                return existing
+            self.misses += 1
+            metrics.count(f"assets.{kind}.miss")
+            self._entries[(kind, asset.digest)] = asset
+            self._bytes += asset.size
+            if kind == "pdf":
+                asset._charge = self._charge
+            self._evict()
+            return asset
+
+    def _charge(self, n):
+        """Count `n` more bytes held by a cached asset, such as a PDF's bytes copy."""
+        with self._lock:
+            self._bytes += n
+            self._evict()
+
+    def _forget(self, asset):
+        self._bytes -= asset.size
+        if isinstance(asset, PdfAsset):
+            asset._forget_copy()
+
+    def _drop_path(self, kind, abspath):
+        _, _, digest = self._paths.pop((kind, abspath))
+        if any(k == kind and v[2] == digest for (k, _), v in self._paths.items()):
+            return
+        asset = self._entries.pop((kind, digest), None)
+        if asset is not None:
+            self._forget(asset)
+
+    def _evict(self):
+        # Keep at least the newest entry even if it alone exceeds the budget.
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            (kind, digest), asset = self._entries.popitem(last=False)
+            self._forget(asset)
+            self.evictions += 1
+            for key in [key for key, v in self._paths.items() if key[0] == kind and v[2] == digest]:
+                del self._paths[key]
+            # The mmap stays valid for sessions still holding a reference; the GC closes it.
+
+    @staticmethod
+    def _load_pdf(path):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return PdfAsset(hash_bytes(mm), mm)
+
+    @staticmethod
+    def _load_annotations(path):
+        from eureka.annotations import AnnotationStore
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        return AnnotationStore.from_bytes(raw, binary=path.endswith(".npz"), digest=hash_bytes(raw))
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def clear(self):
+        with self._lock:
+            for asset in self._entries.values():
+                self._forget(asset)
+            self._entries.clear()
+            self._paths.clear()
+            self._bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """Return the process-wide AssetCache, sized by EUREKA_ASSET_CACHE_MB if set."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_mb = os.environ.get("EUREKA_ASSET_CACHE_MB")
+                _cache = AssetCache(int(max_mb) * 1024 * 1024 if max_mb else DEFAULT_MAX_BYTES)
+    return _cache
@@ -0,0 +1,42 @@
+"""Rendering matplotlib charts to cached PNG bytes.
+
+Charts are drawn on a standalone `matplotlib.figure.Figure` rather than through pyplot,
+so nothing is registered globally and every figure is freed once rendered. Renders are
+kept in a process-wide LRU keyed by chart kind and a digest of the plotted data, so
+sessions plotting the same numbers share one PNG.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from eureka import metrics
+
+MAX_RENDERS = 256
+
+_renders = OrderedDict()
+_renders_lock = threading.Lock()
+
+
+def render_png(kind, data, draw, figsize=(8, 6)):
+    """PNG of `draw(fig)` for `data`, a bytes-like digest input such as an array's `tobytes()`."""
+    key = (kind, hashlib.sha1(data).hexdigest())
+    with _renders_lock:
+        png = _renders.get(key)
+        if png is not None:
+            _renders.move_to_end(key)
+            metrics.count("charts.hit")
+            return png
+    with metrics.span(f"charts.render.{kind}"):
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=figsize)
+        draw(fig)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", bbox_inches="tight")
+        png = buf.getvalue()
+    with _renders_lock:
+        _renders[key] = png
+        while len(_renders) > MAX_RENDERS:
+            _renders.popitem(last=False)
+    return png
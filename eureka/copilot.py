@@ -0,0 +1,273 @@
+"""Knowledge Copilot backends and the streaming bridge used by the chat sidebar.
+
+A `CopilotBackend` yields tokens from an async generator. The `Copilot` runs backends on
+one process-wide asyncio loop, caps how many requests run at once across all sessions,
+and exposes each answer as a plain generator that `st.write_stream` consumes as tokens
+arrive. Every request's queueing delay, time-to-first-token and generation time go to
+`eureka.metrics` as spans, and their recent p50/p95 are shown in the debug panel.
+
+By default an in-process stand-in model server is started on a free local port and called
+over HTTP. Set EUREKA_COPILOT_URL to point at another server speaking the same protocol,
+for example one started with `python -m eureka.copilot --port 8765`.
+"""
+import abc
+import argparse
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from eureka import metrics
+
+MAX_CONCURRENCY = int(os.environ.get("EUREKA_COPILOT_CONCURRENCY", 8))
+STANDIN_TOKEN_DELAY = float(os.environ.get("EUREKA_STANDIN_TOKEN_DELAY", 0))
+
+_DONE = object()
+
+log = logging.getLogger(__name__)
+
+
+class CopilotError(RuntimeError):
+    pass
+
+
+def standin_reply(prompt):
+    """Canned answer of the stand-in model server."""
+    prompt = prompt.lower()
+    if "explain" in prompt:
+        return "This is a simple explanation for the super complicated lines you selected."
+    elif "quiz" in prompt or "test" in prompt:
+        return "Click on the 'Test Knowledge' button to take quizzes on papers you've read or explore your knowledge map."
+    elif "mode" in prompt or "reading" in prompt:
+        return "We offer three reading modes: Exploratory (for new ideas), Understanding (for comprehensive learning), and Revisiting (for quick review)."
+    return "How can I help you with your academic paper reading experience today? You can ask about reading modes, paper uploads, or knowledge testing."
+
+
+class CopilotBackend(abc.ABC):
+    """Interface for copilot backends."""
+
+    @abc.abstractmethod
+    async def stream(self, prompt, context=None):
+        """Yield answer tokens for `prompt` as they are produced; `context` is the paper text it is about."""
+        yield
+
+
+class HttpBackend(CopilotBackend):
+    """Calls a model server that answers `POST /generate` with newline-delimited JSON tokens."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path.rstrip("/") + "/generate"
+
+    async def stream(self, prompt, context=None):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            body = json.dumps({"prompt": prompt, "context": context}).encode()
+            writer.write(
+                f"POST {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            status = await reader.readline()
+            if status.split(b" ", 2)[1:2] != [b"200"]:
+                raise CopilotError(f"model server answered {status.decode(errors='replace').strip()!r}")
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            async for line in reader:
+                if line.strip():
+                    yield json.loads(line)["token"]
+        finally:
+            writer.close()
+
+
+class StandinModelServer:
+    """Local HTTP stand-in for a model server, streaming `standin_reply` word by word."""
+
+    def __init__(self, host="127.0.0.1", port=0, token_delay=STANDIN_TOKEN_DELAY):
+        self.host = host
+        self.port = port
+        self.token_delay = token_delay
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            await reader.readline()
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            request = json.loads(await reader.readexactly(length))
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n")
+            for word in standin_reply(request["prompt"]).split():
+                writer.write(json.dumps({"token": word + " "}).encode() + b"\n")
+                await writer.drain()
+                if self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class RequestMetrics:
+    """Timings of one copilot request, in seconds."""
+
+    __slots__ = ("queue_delay", "ttft", "duration", "tokens")
+
+    def __init__(self, queue_delay, ttft, duration, tokens):
+        self.queue_delay = queue_delay
+        self.ttft = ttft
+        self.duration = duration
+        self.tokens = tokens
+
+    @property
+    def tokens_per_s(self):
+        return self.tokens / self.duration if self.duration > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "queue_delay": self.queue_delay,
+            "ttft": self.ttft,
+            "duration": self.duration,
+            "tokens": self.tokens,
+            "tokens_per_s": self.tokens_per_s,
+        }
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+class Copilot:
+    """Runs a backend on the shared event loop with bounded concurrency and records metrics."""
+
+    def __init__(self, backend, loop, max_concurrency=MAX_CONCURRENCY, history=1000):
+        self.backend = backend
+        self.recent = deque(maxlen=history)
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def stream(self, prompt, context=None):
+        """Yield answer tokens as they arrive; safe to pass straight to `st.write_stream`."""
+        tokens = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._produce(prompt, context, tokens, time.perf_counter()), self._loop
+        )
+        try:
+            while (token := tokens.get()) is not _DONE:
+                if isinstance(token, BaseException):
+                    raise token
+                yield token
+        finally:
+            # Stops the backend call if the reader navigated away mid-answer.
+            future.cancel()
+
+    async def _produce(self, prompt, context, tokens, submitted):
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                first = None
+                count = 0
+                async for token in self.backend.stream(prompt, context):
+                    if first is None:
+                        first = time.perf_counter()
+                    count += 1
+                    tokens.put(token)
+                finished = time.perf_counter()
+            request = RequestMetrics(
+                queue_delay=started - submitted,
+                ttft=(first or finished) - submitted,
+                duration=finished - started,
+                tokens=count,
+            )
+            self.recent.append(request)
+            metrics.observe("copilot.queue", request.queue_delay)
+            metrics.observe("copilot.ttft", request.ttft)
+            metrics.observe("copilot.generate", request.duration)
+            metrics.count("copilot.tokens", count)
+        except Exception as e:
+            tokens.put(e)
+        finally:
+            tokens.put(_DONE)
+
+    def summary(self):
+        """Return request count and p50/p95 of each recorded metric."""
+        recent = list(self.recent)
+        summary = {"requests": len(recent)}
+        for name in ("queue_delay", "ttft", "tokens_per_s"):
+            values = [getattr(m, name) for m in recent]
+            summary[name] = {"p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+        return summary
+
+
+_loop = None
+_copilot = None
+_copilot_lock = threading.Lock()
+
+
+def _event_loop():
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        threading.Thread(target=_loop.run_forever, name="eureka-copilot", daemon=True).start()
+    return _loop
+
+
+def get_copilot():
+    """Return the process-wide Copilot, starting the stand-in model server if needed."""
+    global _copilot
+    if _copilot is None:
+        with _copilot_lock:
+            if _copilot is None:
+                loop = _event_loop()
+                url = os.environ.get("EUREKA_COPILOT_URL")
+                if not url:
+                    server = asyncio.run_coroutine_threadsafe(StandinModelServer().start(), loop).result()
+                    url = server.url
+                _copilot = Copilot(HttpBackend(url), loop)
+    return _copilot
+
+
+def copilot_summary():
+    """Summary of the process-wide Copilot's recent requests, or None before its first request."""
+    return _copilot.summary() if _copilot is not None else None
+
+
+async def _serve(host, port, token_delay):
+    server = await StandinModelServer(host, port, token_delay).start()
+    log.info("Stand-in model server listening on %s", server.url)
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stand-in copilot model server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-delay", type=float, default=STANDIN_TOKEN_DELAY)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    asyncio.run(_serve(args.host, args.port, args.token_delay))
@@ -0,0 +1,82 @@
+"""In-app debug panel for the timings collected by `eureka.metrics`, and session memory tracking."""
+import functools
+
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+from eureka import metrics
+from eureka.copilot import copilot_summary
+from eureka.memory import get_session_memory
+
+SLOWEST = 10
+
+
+def metrics_panel():
+    """Sidebar expander with the slowest spans of the last rerun; shown only when metrics are enabled."""
+    if not metrics.ENABLED:
+        return
+    with st.sidebar.expander("⏱️ Timings"):
+        spans = metrics.last_rerun(st.session_state)[:SLOWEST]
+        if not spans:
+            st.caption("No rerun measured yet.")
+        for name, seconds in spans:
+            st.text(f"{seconds * 1000:8.1f} ms  {name}")
+        session = st.session_state.get("_metrics")
+        if session is not None and session.counters:
+            st.caption(" · ".join(f"{name} {n}" for name, n in sorted(session.counters.items())))
+        copilot = copilot_summary()
+        if copilot is not None and copilot["requests"]:
+            ms = lambda name, q: f"{copilot[name][q] * 1000:.0f}"
+            st.caption(f"Copilot, last {copilot['requests']} requests: queue p50/p95 {ms('queue_delay', 'p50')}/"
+                       f"{ms('queue_delay', 'p95')} ms · first token {ms('ttft', 'p50')}/{ms('ttft', 'p95')} ms · "
+                       f"{copilot['tokens_per_s']['p50']:.0f} tokens/s")
+        report = get_session_memory().report()
+        ctx = get_script_run_ctx()
+        mine = next((s for s in report["sessions"] if ctx is not None and s["session"] == ctx.session_id), None)
+        if mine is not None:
+            st.caption(f"This session {mine['bytes'] / 1024:.0f} KB of {report['session_budget'] / 2**20:.0f} MB · "
+                       f"largest: {', '.join(f'{k} {n / 1024:.0f} KB' for k, n in mine['largest'])}")
+        st.caption(f"All sessions {report['total_bytes'] / 2**20:.1f} MB of {report['total_budget'] / 2**20:.0f} MB "
+                   f"({report['session_count']} sessions, {report['shed_sessions']} shed)")
+
+
+def release_upload():
+    """Drop the server's in-memory copy of this session's uploads once they are kept elsewhere."""
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        ctx.uploaded_file_mgr.remove_session_files(ctx.session_id)
+
+
+def _release(session_id):
+    """Free the server's copy of an idle session's uploads; False once it has disconnected or closed."""
+    # Both calls are documented as safe from any thread; the session's own state is left to it
+    runtime = Runtime.instance()
+    if not runtime.is_active_session(session_id):
+        return False
+    runtime.uploaded_file_mgr.remove_session_files(session_id)
+    return True
+
+
+def resume_session():
+    """Drop the state this session was asked to shed while it was idle; call at the start of every rerun."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    for key in get_session_memory().resume(ctx.session_id):
+        if key in st.session_state:
+            del st.session_state[key]
+
+
+def track_memory():
+    """Measure this session's state against the memory budget, shedding idle sessions if over it."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    values = st.session_state.to_dict()
+    uploads = [k for k, v in values.items() if isinstance(v, UploadedFile)
+               or isinstance(v, list) and any(isinstance(f, UploadedFile) for f in v)]
+    # Sessions run outside a server (tests, scripts) have no runtime to release them through
+    release = functools.partial(_release, ctx.session_id) if Runtime.exists() else None
+    get_session_memory().track(ctx.session_id, values, uid=st.session_state.get("uid"), extra=uploads, release=release)
@@ -0,0 +1,160 @@
+"""Two-tier cache for "Explain selected lines" answers.
+
+Answers are keyed by the paper's content hash, the normalised selection and the reader's
+experience bucket, so readers at the same level asking about the same passage share one
+answer. Lookups go to an in-memory LRU first, then to a SQLite file on disk. Both tiers
+expire entries after a TTL and are bounded in size. A cached answer is replayed through
+the same token stream as a fresh one, without calling the copilot.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from eureka.paths import data_path
+
+TTL_SECONDS = int(os.environ.get("EUREKA_EXPLAIN_TTL", 7 * 24 * 3600))
+MEMORY_ENTRIES = 2048
+DISK_MAX_BYTES = 64 * 1024 * 1024
+
+EXPERIENCE_BUCKETS = ("Beginner", "Intermediate", "Advanced", "Expert")
+_TOKEN = re.compile(r"\S+\s*")
+
+
+def experience_bucket(profile):
+    """Return the reader's experience level, defaulting to the profile dialog's default."""
+    experience = (profile or {}).get("experience")
+    return experience if experience in EXPERIENCE_BUCKETS else "Intermediate"
+
+
+def normalize_selection(selection):
+    """Normalise a selection given as text or as a (page, start_word, end_word) span."""
+    if selection is None:
+        return ""
+    if isinstance(selection, (tuple, list)):
+        page, start, end = selection
+        start, end = sorted((int(start), int(end)))
+        return f"span:{int(page)}:{start}-{end}"
+    return "text:" + " ".join(selection.lower().split())
+
+
+def explanation_key(paper_digest, selection, profile):
+    """Cache key for an explanation of `selection` in a paper for a reader's profile."""
+    raw = "\x1f".join((paper_digest or "", normalize_selection(selection), experience_bucket(profile)))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ExplanationCache:
+    """In-memory LRU in front of a SQLite store, both with TTL expiry."""
+
+    def __init__(self, path=None, ttl=TTL_SECONDS, memory_entries=MEMORY_ENTRIES, disk_max_bytes=DISK_MAX_BYTES):
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()  # key -> (created, answer)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or data_path("explanations.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS explanations_accessed ON explanations (accessed)")
+        self._db.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached answer for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+            row = self._db.execute(
+                "SELECT created, answer FROM explanations WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE explanations SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, row)
+            self.disk_hits += 1
+            return row[1]
+
+    def put(self, key, answer):
+        now = time.time()
+        with self._lock:
+            self._remember(key, (now, answer))
+            self._db.execute(
+                "INSERT OR REPLACE INTO explanations (key, answer, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, answer, now, now),
+            )
+            self._evict_disk(now)
+            self._db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        self._db.execute("DELETE FROM explanations WHERE created <= ?", (now - self.ttl,))
+        (total,) = self._db.execute("SELECT COALESCE(SUM(LENGTH(answer)), 0) FROM explanations").fetchone()
+        if total > self.disk_max_bytes:
+            # Drop least recently used answers until we are back under the budget.
+            self._db.execute(
+                "DELETE FROM explanations WHERE key IN ("
+                " SELECT key FROM (SELECT key, SUM(LENGTH(answer)) OVER (ORDER BY accessed DESC) AS running"
+                " FROM explanations) WHERE running > ?)",
+                (self.disk_max_bytes,),
+            )
+
+    def stream(self, key, produce):
+        """Yield the answer for `key`: replayed from cache, or streamed from `produce()` and stored."""
+        answer = self.get(key)
+        if answer is not None:
+            yield from _TOKEN.findall(answer)
+            return
+        tokens = []
+        for token in produce():
+            tokens.append(token)
+            yield token
+        # Only complete answers reach this point; an abandoned stream is not cached.
+        self.put(key, "".join(tokens))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            (disk_entries,) = self._db.execute("SELECT COUNT(*) FROM explanations").fetchone()
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_explanation_cache():
+    """Return the process-wide ExplanationCache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExplanationCache()
+    return _cache
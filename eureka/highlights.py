@@ -0,0 +1,339 @@
+"""Smart highlighting: sentences of a paper scored against the reader's profile.
+
+A parsed paper (`eureka.ingest.IngestedPaper`) is split into sentences from its word
+boxes. Each sentence gets an importance score from its terms, weighted by how often the
+paper uses them and how rare they are in the recommendation corpus, with a boost for
+cue phrases such as "we propose" and for the first page, and is ranked within the paper.
+Its familiarity is its cosine similarity to the corpus's profile of each topic, scaled so
+that TOPIC_MATCH counts as fully on topic. It is absolute rather than ranked, so an
+off-topic paper has next to no familiar sentences. For a reader, novelty is one minus the
+familiarity on the topics they know, scaled by their experience.
+
+Exploratory mode highlights only important sentences that are new to the reader.
+Understanding mode highlights more sentences in three colours: key ideas, supporting
+material, and context that ties in with topics the reader already knows.
+
+The paper-level scores are computed once per paper, and both modes are built together
+per (paper, profile bucket), so switching modes only looks up a cached AnnotationStore.
+Paper-level scores are saved under the data directory, keyed by the paper's content hash
+and the scoring version, so a paper scored offline by `eureka.pipeline` is never
+rescored. The pipeline also saves both modes' highlights for the default profile, which
+are loaded instead of built.
+"""
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from eureka import metrics
+from eureka.annotations import AnnotationStore
+from eureka.explain import experience_bucket
+from eureka.knowledge import TOPICS
+from eureka.paths import data_path
+from eureka.text import terms
+
+FORMAT_VERSION = 2
+MODES = ("Exploratory", "Understanding")
+MAX_PAPERS = 32
+MAX_STORES = 256
+MAX_SENTENCES = 200  # highlighted sentences per paper and mode
+MIN_SENTENCE_WORDS = 5
+# Cosine similarity between a sentence and a topic's corpus profile at which the sentence
+# counts as fully about the topic; sentences rarely score above it
+TOPIC_MATCH = 0.25
+# Familiarity from which an Understanding highlight is coloured as context
+CONTEXT_AT = 0.5
+
+KEY_COLOR = "rgba(255, 0, 0, 1)"
+SUPPORTING_COLOR = "rgba(255, 165, 0, 1)"
+CONTEXT_COLOR = "rgba(30, 144, 255, 1)"
+BORDER = "solid"
+
+# How much knowing a topic makes its sentences old news, and how much of the paper
+# Understanding mode highlights, by experience level
+FAMILIARITY_WEIGHT = {"Beginner": 0.25, "Intermediate": 0.5, "Advanced": 0.75, "Expert": 1.0}
+UNDERSTANDING_SHARE = {"Beginner": 0.3, "Intermediate": 0.25, "Advanced": 0.2, "Expert": 0.15}
+EXPLORATORY_SHARE = 0.1
+
+_CUES = re.compile(
+    r"\b(we (propose|present|introduce|show|find|found|argue|demonstrate|contribute)|"
+    r"in this (paper|work|study)|our (results|findings|contribution|approach)|"
+    r"this (paper|work|study) (presents|proposes|shows|argues)|in summary|we conclude)\b",
+    re.IGNORECASE,
+)
+_ABBREVIATIONS = frozenset(["e.g.", "i.e.", "al.", "fig.", "eq.", "etc.", "vs.", "cf.", "no.", "sec."])
+
+
+def profile_bucket(profile):
+    """The parts of a profile highlighting depends on: experience and known topics."""
+    known = set((profile or {}).get("familiar_subjects") or ())
+    return experience_bucket(profile), tuple(t for t in TOPICS if t in known)
+
+
+DEFAULT_BUCKET = profile_bucket(None)
+
+
+def _ends_sentence(word):
+    return word[-1:] in ".?!" and word.lower() not in _ABBREVIATIONS
+
+
+def split_sentences(page):
+    """(text, [(x0, y0, x1, y1) per line], block number) of each sentence on a PageResult."""
+    sentences = []
+    words, lines = [], {}
+    block = None
+
+    def close():
+        if len(words) >= MIN_SENTENCE_WORDS:
+            sentences.append((" ".join(words), list(lines.values()), block))
+        words.clear()
+        lines.clear()
+
+    for x0, y0, x1, y1, word, block_no, line_no, _ in page.words:
+        if block_no != block:
+            close()
+            block = block_no
+        words.append(word)
+        box = lines.get(line_no)
+        lines[line_no] = (x0, y0, x1, y1) if box is None else (
+            min(box[0], x0), min(box[1], y0), max(box[2], x1), max(box[3], y1))
+        if _ends_sentence(word):
+            close()
+    close()
+    return sentences
+
+
+class PaperScores:
+    """Profile-independent scores of a paper's sentences."""
+
+    def __init__(self, texts, pages, blocks, importance, familiarity, boxes):
+        self.texts = texts
+        self.pages = pages  # page number of each sentence
+        self.blocks = blocks  # text block each sentence starts in, in reading order on its page
+        self.importance = importance  # percentile rank in [0, 1]
+        self.familiarity = familiarity  # (sentences, topics) similarity in [0, 1]
+        self.boxes = boxes  # line boxes of each sentence
+
+    @classmethod
+    def from_paper(cls, paper, recommender=None):
+        pages, blocks, texts, boxes = [], [], [], []
+        for number in sorted(paper.pages):
+            for text, lines, block in split_sentences(paper.pages[number]):
+                pages.append(number)
+                blocks.append(block)
+                texts.append(text)
+                boxes.append(lines)
+        sentence_terms = [terms(t) for t in texts]
+
+        vocab = recommender.vocab if recommender is not None else {}
+        idf = np.asarray(recommender.idf) if recommender is not None else np.ones(0, dtype=np.float32)
+        # Terms the corpus has never seen count as the rarest
+        unseen_idf = float(idf.max()) if len(idf) else 1.0
+        paper_tf = Counter(t for ts in sentence_terms for t in ts)
+        weight = {t: (1 + math.log(n)) * (float(idf[vocab[t]]) if t in vocab else unseen_idf) for t, n in paper_tf.items()}
+
+        importance = np.zeros(len(texts), dtype=np.float32)
+        for i, (text, ts) in enumerate(zip(texts, sentence_terms)):
+            unique = set(ts)
+            if unique:
+                importance[i] = sum(weight[t] for t in unique) / math.sqrt(len(unique))
+            if _CUES.search(text):
+                importance[i] *= 1.5
+            if pages[i] == 1:
+                importance[i] *= 1.2
+
+        familiarity = np.zeros((len(texts), len(TOPICS)), dtype=np.float32)
+        if recommender is not None:
+            profiles = recommender.topic_profiles()
+            for i, ts in enumerate(sentence_terms):
+                tf = Counter(t for t in ts if t in vocab)
+                if not tf:
+                    continue
+                ids = np.fromiter((vocab[t] for t in tf), dtype=np.intp, count=len(tf))
+                w = (1 + np.log(np.fromiter(tf.values(), dtype=np.float32, count=len(tf)))) * idf[ids]
+                familiarity[i] = profiles[:, ids] @ (w / np.linalg.norm(w))
+        familiarity = np.clip(familiarity / TOPIC_MATCH, 0, 1)
+        return cls(texts, np.array(pages, dtype=np.int32), np.array(blocks, dtype=np.int32),
+                   _rank(importance), familiarity, boxes)
+
+    @classmethod
+    def load(cls, path):
+        """Scores saved by `save`, or None if they were saved by another scoring version."""
+        with np.load(path, allow_pickle=False) as z:
+            if int(z["version"]) != FORMAT_VERSION:
+                return None
+            ptr = z["box_ptr"].tolist()
+            flat = [tuple(box) for box in z["boxes"].tolist()]
+            return cls(z["texts"].tolist(), z["pages"], z["blocks"], z["importance"], z["familiarity"],
+                       [flat[ptr[i]:ptr[i + 1]] for i in range(len(ptr) - 1)])
+
+    def save(self, path):
+        # Line boxes are ragged, so they are stored flat with each sentence's offset
+        box_ptr = np.zeros(len(self.boxes) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in self.boxes], out=box_ptr[1:])
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, version=FORMAT_VERSION, texts=np.array(self.texts, dtype=str),
+                 pages=self.pages, blocks=self.blocks, importance=self.importance, familiarity=self.familiarity,
+                 boxes=np.array([box for b in self.boxes for box in b], dtype=np.float32).reshape(-1, 4),
+                 box_ptr=box_ptr)
+        os.replace(tmp, path)
+
+    def highlights(self, mode, bucket):
+        """Annotation records for `mode` and a profile bucket from `profile_bucket`."""
+        experience, known = bucket
+        n = len(self.pages)
+        if n == 0:
+            return []
+        familiar = self.familiarity[:, [TOPICS.index(t) for t in known]].max(axis=1) if known else np.zeros(n)
+        if mode == "Exploratory":
+            score = self.importance * (1 - FAMILIARITY_WEIGHT[experience] * familiar)
+            share = EXPLORATORY_SHARE
+        elif mode == "Understanding":
+            score = self.importance
+            share = UNDERSTANDING_SHARE[experience]
+        else:
+            raise ValueError(f"unknown reading mode {mode!r}; expected one of {MODES}")
+
+        k = min(max(1, round(n * share)), MAX_SENTENCES)
+        chosen = np.argsort(-score, kind="stable")[:k]
+        records = []
+        for rank, i in enumerate(chosen):
+            if mode == "Exploratory" or rank < k / 3:
+                color = KEY_COLOR
+            elif familiar[i] >= CONTEXT_AT:
+                color = CONTEXT_COLOR
+            else:
+                color = SUPPORTING_COLOR
+            for x0, y0, x1, y1 in self.boxes[i]:
+                records.append({"page": int(self.pages[i]), "x": x0, "y": y0, "width": x1 - x0,
+                                "height": y1 - y0, "color": color, "border": BORDER})
+        return records
+
+
+def highlights_path(digest, mode):
+    """Where the default profile's highlights of a paper in `mode` are saved, by this scoring version."""
+    return data_path("highlights", digest, f"{mode.lower()}.v{FORMAT_VERSION}.npz")
+
+
+def _rank(values):
+    """Percentile rank in [0, 1] of each value within its column; zeros stay 0."""
+    n = len(values)
+    ranks = np.zeros(values.shape, dtype=np.float32)
+    if n:
+        steps = np.linspace(0, 1, n, dtype=np.float32) if n > 1 else np.ones(1, dtype=np.float32)
+        order = np.argsort(values, axis=0, kind="stable")
+        np.put_along_axis(ranks, order, steps.reshape((n,) + (1,) * (values.ndim - 1)), axis=0)
+    ranks[values == 0] = 0
+    return ranks
+
+
+class Highlighter:
+    """Process-wide cache of highlights per (paper digest, mode, profile bucket)."""
+
+    def __init__(self, max_papers=MAX_PAPERS):
+        self.max_papers = max_papers
+        self._scores = OrderedDict()  # digest -> PaperScores
+        self._highlights = OrderedDict()  # (digest, mode, bucket) -> AnnotationStore
+        self._pending = {}  # (digest, bucket) -> Future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="highlights")
+
+    def highlights(self, paper, mode, profile):
+        """AnnotationStore of the highlights of a fully parsed `paper` in `mode` for `profile`."""
+        bucket = profile_bucket(profile)
+        key = (paper.digest, mode, bucket)
+        with self._lock:
+            store = self._highlights.get(key)
+            if store is not None:
+                self._highlights.move_to_end(key)
+                metrics.count("highlights.hit")
+                return store
+        # From the build itself, since the cache may have evicted the entry by now
+        return self.prepare(paper, profile).result()[mode]
+
+    def prepare(self, paper, profile):
+        """Start computing every mode's highlights of `paper` for `profile`; returns a Future of {mode: store}."""
+        bucket = profile_bucket(profile)
+        with self._lock:
+            future = self._pending.get((paper.digest, bucket))
+            if future is None:
+                future = self._pending[(paper.digest, bucket)] = self._pool.submit(self._build, paper, bucket)
+        return future
+
+    def _build(self, paper, bucket):
+        try:
+            with self._lock:
+                cached = {mode: self._highlights.get((paper.digest, mode, bucket)) for mode in MODES}
+            if all(store is not None for store in cached.values()):
+                return cached
+            stores = self._saved(paper, bucket)
+            if stores is None:
+                with metrics.span("highlights.build"):
+                    scores = self.paper_scores(paper)
+                    stores = {mode: AnnotationStore.from_records(scores.highlights(mode, bucket)) for mode in MODES}
+            with self._lock:
+                for mode, store in stores.items():
+                    self._highlights[(paper.digest, mode, bucket)] = store
+                while len(self._highlights) > MAX_STORES:
+                    self._highlights.popitem(last=False)
+            return stores
+        finally:
+            with self._lock:
+                self._pending.pop((paper.digest, bucket), None)
+
+    @staticmethod
+    def _saved(paper, bucket):
+        """Both modes' highlights saved by the pipeline, for the default profile only."""
+        if bucket != DEFAULT_BUCKET:
+            return None
+        paths = {mode: highlights_path(paper.digest, mode) for mode in MODES}
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+        try:
+            return {mode: AnnotationStore.load(path) for mode, path in paths.items()}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def paper_scores(self, paper):
+        """The profile-independent PaperScores of a fully parsed `paper`, from memory, disk or a fresh scoring."""
+        scores = self._scores.get(paper.digest)
+        if scores is None:
+            from eureka.recommend import get_recommender
+
+            try:
+                recommender = get_recommender()
+            except (OSError, ValueError):
+                recommender = None
+            path = data_path("scores", f"{paper.digest}.npz")
+            if os.path.exists(path):
+                try:
+                    scores = PaperScores.load(path)
+                except (OSError, ValueError, KeyError):
+                    scores = None
+            if scores is None:
+                with metrics.span("highlights.score_paper"):
+                    scores = PaperScores.from_paper(paper, recommender)
+                scores.save(path)
+            with self._lock:
+                self._scores[paper.digest] = scores
+                while len(self._scores) > self.max_papers:
+                    self._scores.popitem(last=False)
+        return scores
+
+
+_highlighter = None
+_highlighter_lock = threading.Lock()
+
+
+def get_highlighter():
+    """Return the process-wide Highlighter."""
+    global _highlighter
+    if _highlighter is None:
+        with _highlighter_lock:
+            if _highlighter is None:
+                _highlighter = Highlighter()
+    return _highlighter
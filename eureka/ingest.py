@@ -0,0 +1,221 @@
+"""Background ingestion of uploaded PDFs.
+
+An upload is hashed, handed to a worker pool and parsed one page at a time. Each parsed
+page is published on the `IngestedPaper` as soon as it is ready, so the viewer and the
+copilot can use page 1 while the rest of the document is still being processed. Papers
+are registered by content hash, so uploading the same file again reuses the earlier work.
+"""
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from eureka import metrics
+from eureka.assets import hash_bytes
+from eureka.paths import data_path
+
+MAX_WORKERS = int(os.environ.get("EUREKA_INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+MAX_PAPERS = 64
+
+# Running headers and footers live in these top/bottom fractions of the page
+_MARGIN = 0.06
+_HEADING_MAX_WORDS = 12
+
+
+class PageResult:
+    """Text, word boxes and headings extracted from one page (1-based `number`)."""
+
+    __slots__ = ("number", "width", "height", "text", "words", "headings")
+
+    def __init__(self, number, width, height, text, words, headings):
+        self.number = number
+        self.width = width
+        self.height = height
+        self.text = text
+        # (x0, y0, x1, y1, word, block_no, line_no, word_no) in PDF points, origin top-left
+        self.words = words
+        self.headings = headings
+
+
+class IngestedPaper:
+    """Progressively populated result of ingesting one PDF."""
+
+    def __init__(self, digest, name=None):
+        self.digest = digest
+        self.name = name
+        # The PDF on local disk, once spooled, so it can be memory-mapped instead of held per session
+        self.path = None
+        self.page_count = None
+        self.metadata = {}  # title, author, creationDate... from the PDF's info dictionary
+        self.pages = {}
+        self.sections = []
+        self.error = None
+        self.done = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def ready_pages(self):
+        return len(self.pages)
+
+    @property
+    def word_count(self):
+        return sum(len(p.words) for p in list(self.pages.values()))
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return "failed"
+        if self.done.is_set():
+            return "done"
+        return "parsing" if self.page_count is not None else "queued"
+
+    def page(self, number, timeout=None):
+        """Return page `number`, waiting up to `timeout` seconds for it to be parsed."""
+        with self._changed:
+            self._changed.wait_for(lambda: number in self.pages or self.done.is_set(), timeout)
+            return self.pages.get(number)
+
+    def text(self, upto=None):
+        """Return the text of the pages parsed so far, in page order."""
+        numbers = sorted(self.pages)
+        if upto is not None:
+            numbers = [n for n in numbers if n <= upto]
+        return "\n".join(self.pages[n].text for n in numbers)
+
+    def _publish(self, result):
+        with self._changed:
+            self.pages[result.number] = result
+            for title, y in result.headings:
+                self.sections.append({"title": title, "page": result.number, "y": y})
+            self._changed.notify_all()
+
+    def _finish(self, error=None):
+        with self._changed:
+            self.error = error
+            self.done.set()
+            self._changed.notify_all()
+
+
+def detect_headings(page_dict, height):
+    """Return (title, y) for blocks that look like section headings on a page.
+
+    A heading is a short block set in a different font from the page body, at least as
+    large as the body text, outside the running header/footer margins.
+    """
+    sizes = Counter()
+    for block in page_dict["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                sizes[(round(span["size"], 1), span["font"])] += len(span["text"])
+    if not sizes:
+        return []
+    body_size, body_font = sizes.most_common(1)[0][0]
+
+    headings = []
+    for block in page_dict["blocks"]:
+        spans = [s for line in block.get("lines", []) for s in line["spans"] if s["text"].strip()]
+        if not spans:
+            continue
+        y = block["bbox"][1]
+        if y < height * _MARGIN or y > height * (1 - _MARGIN):
+            continue
+        if any(s["font"] == body_font or round(s["size"], 1) < body_size for s in spans):
+            continue
+        title = " ".join(
+            "".join(s["text"] for s in line["spans"]).strip() for line in block["lines"]
+        ).strip()
+        if len(title.split()) > _HEADING_MAX_WORDS or title.endswith(".") or not re.search(r"[A-Za-z]{3}", title):
+            continue
+        headings.append((title, y))
+    return headings
+
+
+def parse_page(page):
+    """Extract a PageResult from a pymupdf page."""
+    height = page.rect.height
+    words = [tuple(w) for w in page.get_text("words")]
+    text = page.get_text("text")
+    headings = detect_headings(page.get_text("dict"), height)
+    return PageResult(page.number + 1, page.rect.width, height, text, words, headings)
+
+
+def parse_pdf(paper, data):
+    """Parse every page of `data` (PDF bytes) into `paper`, publishing pages as they are ready."""
+    import pymupdf
+
+    with pymupdf.open(stream=data, filetype="pdf") as doc:
+        paper.page_count = doc.page_count
+        paper.metadata = doc.metadata or {}
+        for page in doc:
+            with metrics.span("ingest.page"):
+                paper._publish(parse_page(page))
+
+
+class Ingestor:
+    """Runs ingestion jobs on a worker pool and deduplicates them by content hash."""
+
+    def __init__(self, max_workers=MAX_WORKERS, max_papers=MAX_PAPERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="eureka-ingest")
+        self._papers = OrderedDict()
+        self._max_papers = max_papers
+        self._lock = threading.Lock()
+
+    def submit(self, data, name=None):
+        """Start ingesting `data` (PDF bytes) unless it was seen before; return the IngestedPaper."""
+        digest = hash_bytes(data)
+        with self._lock:
+            paper = self._papers.get(digest)
+            if paper is not None and paper.error is None:
+                self._papers.move_to_end(digest)
+                return paper
+            paper = IngestedPaper(digest, name)
+            self._papers[digest] = paper
+            while len(self._papers) > self._max_papers:
+                self._papers.popitem(last=False)
+        self._pool.submit(self._run, paper, bytes(data))
+        return paper
+
+    def reopen(self, digest, name=None):
+        """The IngestedPaper for `digest`, parsed again from its spooled PDF if this process hasn't seen it; None if neither."""
+        paper = self.get(digest)
+        if paper is not None:
+            return paper
+        path = data_path("papers", f"{digest}.pdf")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return self.submit(f.read(), name)
+
+    def get(self, digest):
+        """Return the IngestedPaper for `digest`, or None if it was never submitted."""
+        with self._lock:
+            return self._papers.get(digest)
+
+    def _run(self, paper, data):
+        try:
+            path = data_path("papers", f"{paper.digest}.pdf")
+            if not os.path.exists(path):
+                with open(f"{path}.tmp", "wb") as f:
+                    f.write(data)
+                os.replace(f"{path}.tmp", path)
+            paper.path = path
+            parse_pdf(paper, data)
+        except Exception as e:
+            paper._finish(e)
+        else:
+            paper._finish()
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    """Return the process-wide Ingestor."""
+    global _ingestor
+    if _ingestor is None:
+        with _ingestor_lock:
+            if _ingestor is None:
+                _ingestor = Ingestor()
+    return _ingestor
@@ -0,0 +1,127 @@
+"""Per-user knowledge model: one mastery value in [0, 1] per topic.
+
+Mastery starts from the profile the reader filled in and moves with every quiz result
+and reading event. Each event updates the vector in place: a running average weighted by
+how much evidence the topic already has, so the full history is never replayed. Rendered
+maps are cached by the vector's content and only drawn again when mastery changes.
+"""
+import numpy as np
+
+from eureka.charts import render_png
+
+TOPICS = ["AI & Labor", "Human-AI Interaction", "Data & Data Economy", "AI in Business/Management",
+          "AI & Decision-Making", "AI in Healthcare", "Automation & Tech Evolution",
+          "AI History & Trends", "AI & Society"]
+TOPIC_INDEX = {t: i for i, t in enumerate(TOPICS)}
+
+# Prior mastery of topics the reader says they are familiar with, by experience level
+EXPERIENCE_PRIOR = {"Beginner": 0.25, "Intermediate": 0.5, "Advanced": 0.7, "Expert": 0.85}
+UNFAMILIAR_PRIOR = 0.1
+PRIOR_EVIDENCE = 2.0
+# Reading a paper counts as this much evidence of full mastery of its topics
+READING_WEIGHT = 0.25
+MIN_LEARNING_RATE = 0.05
+
+
+class KnowledgeModel:
+    """Mastery and evidence vectors over TOPICS, plus a version bumped on every change."""
+
+    def __init__(self, mastery=None, evidence=None):
+        self.mastery = np.full(len(TOPICS), UNFAMILIAR_PRIOR, dtype=np.float32) if mastery is None else np.asarray(mastery, dtype=np.float32)
+        self.evidence = np.full(len(TOPICS), PRIOR_EVIDENCE, dtype=np.float32) if evidence is None else np.asarray(evidence, dtype=np.float32)
+        self.version = 0
+        self.seeded = False
+
+    @classmethod
+    def from_profile(cls, profile):
+        model = cls()
+        if profile:
+            model.seeded = True
+            prior = EXPERIENCE_PRIOR.get(profile.get("experience"), EXPERIENCE_PRIOR["Intermediate"])
+            for topic in profile.get("familiar_subjects", []):
+                if topic in TOPIC_INDEX:
+                    model.mastery[TOPIC_INDEX[topic]] = prior
+        return model
+
+    def _observe(self, topics, score, weight):
+        idx = np.array([TOPIC_INDEX[t] for t in topics if t in TOPIC_INDEX], dtype=np.intp)
+        if not len(idx):
+            return
+        self.evidence[idx] += weight
+        rate = np.maximum(weight / self.evidence[idx], MIN_LEARNING_RATE)
+        self.mastery[idx] += rate * (score - self.mastery[idx])
+        self.version += 1
+
+    def record_quiz(self, topic, n_correct, n_total):
+        """Update `topic` with a quiz result; each question counts as one unit of evidence."""
+        if n_total:
+            self._observe([topic], n_correct / n_total, float(n_total))
+
+    def record_reading(self, topics, weight=READING_WEIGHT):
+        """Nudge the topics of a paper that was read towards mastery."""
+        self._observe(topics, 1.0, weight)
+
+    def weakest(self, n):
+        """The `n` topics with the lowest mastery."""
+        return [TOPICS[i] for i in np.argsort(self.mastery, kind="stable")[:n]]
+
+    def to_state(self):
+        return {"mastery": self.mastery.tolist(), "evidence": self.evidence.tolist(), "seeded": self.seeded}
+
+    @classmethod
+    def from_state(cls, state):
+        model = cls(state["mastery"], state["evidence"])
+        model.seeded = state["seeded"]
+        return model
+
+    def as_dict(self):
+        return {t: float(m) for t, m in zip(TOPICS, self.mastery)}
+
+
+def session_knowledge(state):
+    """Return the reader's KnowledgeModel from Streamlit session state, creating it from the profile."""
+    model = state.get("knowledge")
+    # A model made before the profile dialog was filled in is re-seeded once it exists
+    if model is None or (not model.seeded and model.version == 0 and state.get("user_profile")):
+        state["knowledge"] = KnowledgeModel.from_profile(state.get("user_profile"))
+    return state["knowledge"]
+
+
+def _draw_map(fig, mastery):
+    ax = fig.add_subplot(projection="polar")
+    angles = np.linspace(0, 2 * np.pi, len(TOPICS), endpoint=False)
+    closed = np.append(angles, angles[0])
+    ax.plot(closed, np.append(mastery, mastery[0]), color="#44bf30")
+    ax.fill(closed, np.append(mastery, mastery[0]), color="#44bf30", alpha=0.25)
+    ax.scatter(angles, mastery, s=80 + 400 * mastery, c=mastery, cmap="YlGn", vmin=0, vmax=1, edgecolors="black", zorder=3)
+    ax.set_xticks(angles)
+    ax.set_xticklabels(TOPICS, fontsize=9)
+    ax.set_ylim(0, 1)
+    ax.set_yticks([0.25, 0.5, 0.75])
+    ax.set_yticklabels(["25%", "50%", "75%"], fontsize=7)
+
+
+def _draw_coverage(fig, mastery):
+    ax = fig.add_subplot()
+    ax.barh(TOPICS, mastery * 100, color="skyblue")
+    ax.set_xlim(0, 100)
+    ax.set_xlabel("Knowledge Coverage (%)")
+    ax.set_title("Your Topic Mastery")
+    ax.grid(True, axis="x", linestyle="--", alpha=0.7)
+    ax.invert_yaxis()
+
+
+def _render(kind, mastery, draw):
+    # Two-decimal mastery is all the chart can show, so nearby vectors share a render.
+    mastery = np.asarray(mastery, dtype=np.float32)
+    return render_png(kind, np.round(mastery, 2).tobytes(), lambda fig: draw(fig, mastery))
+
+
+def render_knowledge_map(mastery):
+    """PNG of the knowledge map for a mastery vector."""
+    return _render("knowledge-map", mastery, _draw_map)
+
+
+def render_topic_coverage(mastery):
+    """PNG of the topic coverage bar chart for a mastery vector."""
+    return _render("topic-coverage", mastery, _draw_coverage)
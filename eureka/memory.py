@@ -0,0 +1,203 @@
+"""Per-session memory accounting, with a budget enforced on idle sessions.
+
+At the end of every rerun `track()` measures the session's state, as the deep size of each
+key with arrays and buffers counted by their bytes (uploaded files included), and marks
+the session as active. Sessions are kept by session id in least-recently-active order.
+
+A session that has been idle for IDLE_SECONDS is shed when it alone is over
+EUREKA_SESSION_MB, or when all sessions together are over EUREKA_SESSIONS_MB. Shedding
+starts with the longest idle session and stops once the total is back under budget. What
+can be freed from outside the session, such as the server's copy of its uploads, is freed
+through its `release` callback right away. Its state is never touched from another
+thread: its DROPPABLE keys, which the pages rebuild from disk when they are missing, and
+the extra keys it was tracked with are handed back by `resume()` at the start of its next
+rerun, and the session drops them itself. Totals and per-session usage are available from
+`report()`, and the totals are also set as metrics gauges.
+"""
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+from eureka import metrics
+
+SESSION_BUDGET = int(float(os.environ.get("EUREKA_SESSION_MB", 16)) * 1024 * 1024)
+TOTAL_BUDGET = int(float(os.environ.get("EUREKA_SESSIONS_MB", 512)) * 1024 * 1024)
+IDLE_SECONDS = float(os.environ.get("EUREKA_SESSION_IDLE", 60))
+# State the pages rebuild when missing: the chat window from its transcript on disk, read
+# marks from the store, and the session's own timings
+DROPPABLE = ("messages", "transcript", "read_state", "_metrics", "_metrics_last_rerun")
+_MAX_DEPTH = 12
+
+
+def sizeof(value, seen=None, depth=0):
+    """Approximate bytes held by `value` and everything it references, counting shared objects once."""
+    seen = set() if seen is None else seen
+    if id(value) in seen or depth > _MAX_DEPTH:
+        return 0
+    seen.add(id(value))
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):  # numpy arrays, memoryviews
+        return nbytes
+    if isinstance(value, (str, bytes, bytearray, int, float, bool, type(None))):
+        return sys.getsizeof(value)
+    if isinstance(value, (type, types.FunctionType, types.MethodType, types.ModuleType)):
+        return 0
+    size = sys.getsizeof(value, 0)
+    if isinstance(value, dict):
+        size += sum(sizeof(k, seen, depth + 1) + sizeof(v, seen, depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sizeof(v, seen, depth + 1) for v in value)
+    else:
+        getbuffer = getattr(value, "getbuffer", None)  # BytesIO and uploaded files
+        if getbuffer is not None:
+            size += getbuffer().nbytes
+        if hasattr(value, "__dict__"):
+            size += sizeof(vars(value), seen, depth + 1)
+        for slot in getattr(type(value), "__slots__", ()):
+            size += sizeof(getattr(value, slot, None), seen, depth + 1)
+    return size
+
+
+def footprint(values):
+    """Bytes held by each key of a session's state."""
+    seen = set()
+    return {key: sizeof(value, seen) for key, value in values.items()}
+
+
+class _Session:
+    __slots__ = ("uid", "keys", "extra", "last_active", "release", "shed")  # shed: keys to drop on resume
+
+    @property
+    def bytes(self):
+        return sum(self.keys.values())
+
+    def droppable(self):
+        return [k for k in DROPPABLE + self.extra if k in self.keys]
+
+
+class SessionMemory:
+    """Process-wide registry of session footprints, least recently active first."""
+
+    def __init__(self, session_budget=SESSION_BUDGET, total_budget=TOTAL_BUDGET, idle_seconds=IDLE_SECONDS):
+        self.session_budget = session_budget
+        self.total_budget = total_budget
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.shed_sessions = 0
+        self.freed_bytes = 0
+
+    def track(self, session_id, values, uid=None, extra=(), release=None):
+        """Record a session's footprint at the end of its rerun, then enforce the budgets.
+
+        `extra` names keys of `values` that can be dropped besides DROPPABLE. `release()` is
+        called from whichever thread sheds the session: it should free what it can without
+        touching the session's state, and return False if the session is gone.
+        """
+        keys = footprint(values)
+        with self._lock:
+            session = self._sessions.pop(session_id, None) or _Session()
+            session.uid = uid
+            session.keys = keys
+            session.extra = tuple(extra)
+            session.last_active = time.monotonic()
+            session.release = release
+            session.shed = ()
+            self._sessions[session_id] = session
+        self.enforce()
+        return session
+
+    def resume(self, session_id):
+        """Mark a session active at the start of its rerun; returns the keys it should drop from its state."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            session.last_active = time.monotonic()
+            dropped, session.shed = list(session.shed), ()
+            for key in dropped:
+                self.freed_bytes += session.keys.pop(key, 0)
+        return dropped
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def total(self):
+        with self._lock:
+            return sum(s.bytes for s in self._sessions.values())
+
+    def enforce(self):
+        """Shed idle sessions, longest idle first, that are over their budget or while all are over the total."""
+        now = time.monotonic()
+        with self._lock:
+            # Keys already due to be dropped don't count against the budget again
+            total = sum(s.bytes - sum(s.keys.get(k, 0) for k in s.shed) for s in self._sessions.values())
+            victims = []
+            for session_id, session in self._sessions.items():
+                if now - session.last_active < self.idle_seconds:
+                    break  # the rest were active more recently still
+                if session.shed or session.release is None:
+                    continue
+                if session.bytes > self.session_budget or total > self.total_budget:
+                    victims.append((session_id, session))
+                    total -= sum(session.keys[k] for k in session.droppable())
+        for session_id, session in victims:
+            alive = session.release()
+            with self._lock:
+                if alive is False:
+                    self._sessions.pop(session_id, None)
+                    continue
+                session.shed = tuple(session.droppable())
+                self.shed_sessions += 1
+            metrics.count("memory.shed_session")
+        self._publish()
+
+    def _publish(self):
+        if not metrics.ENABLED:
+            return
+        report = self.report(top=1)
+        metrics.process.set("session_memory_bytes", report["total_bytes"])
+        metrics.process.set("session_memory_max_bytes", report["sessions"][0]["bytes"] if report["sessions"] else 0)
+        metrics.process.set("sessions_tracked", report["session_count"])
+
+    def report(self, top=None):
+        """Total and per-session usage, largest sessions first."""
+        now = time.monotonic()
+        with self._lock:
+            sessions = [{
+                "session": session_id,
+                "uid": s.uid,
+                "bytes": s.bytes,
+                "idle_seconds": now - s.last_active,
+                "shed": bool(s.shed),
+                "largest": sorted(s.keys.items(), key=lambda kv: kv[1], reverse=True)[:3],
+            } for session_id, s in self._sessions.items()]
+            shed, freed = self.shed_sessions, self.freed_bytes
+        sessions.sort(key=lambda s: s["bytes"], reverse=True)
+        return {
+            "total_bytes": sum(s["bytes"] for s in sessions),
+            "total_budget": self.total_budget,
+            "session_budget": self.session_budget,
+            "session_count": len(sessions),
+            "shed_sessions": shed,
+            "freed_bytes": freed,
+            "sessions": sessions[:top] if top is not None else sessions,
+        }
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_session_memory():
+    """Return the process-wide SessionMemory, with budgets from EUREKA_SESSION_MB and EUREKA_SESSIONS_MB."""
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                _memory = SessionMemory()
+    return _memory
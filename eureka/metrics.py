@@ -0,0 +1,177 @@
+"""Timing spans and counters around the app's hot paths.
+
+Instrumentation is off unless EUREKA_METRICS is set. While it is off, `span()` hands back
+a shared no-op context manager and `count()` returns immediately, so the calls can stay
+in hot code. When on, every span and counter is added to a process-wide registry and to
+the registry of the session whose script is running on the current thread, between
+`start_rerun()` and `finish_rerun()`. The process registry is written in Prometheus text
+format to `metrics.prom` under the data directory at most every EUREKA_METRICS_INTERVAL
+seconds, ready for a node-exporter textfile collector or a quick `cat`.
+"""
+import contextlib
+import os
+import threading
+import time
+
+from eureka.paths import data_path
+
+ENABLED = os.environ.get("EUREKA_METRICS", "").lower() not in ("", "0", "false", "no")
+EXPORT_INTERVAL = float(os.environ.get("EUREKA_METRICS_INTERVAL", 10))
+
+_NOOP = contextlib.nullcontext()
+
+
+class Metrics:
+    """Counters, gauges, and count/total/max seconds of each named span."""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.spans = {}  # name -> [count, total seconds, max seconds]
+        self._lock = threading.Lock()
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                self.spans[name] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                if seconds > stats[2]:
+                    stats[2] = seconds
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """Copies of the counters and span stats."""
+        with self._lock:
+            return dict(self.counters), {name: list(stats) for name, stats in self.spans.items()}
+
+    def to_prometheus(self, prefix="eureka"):
+        """The registry in Prometheus text exposition format."""
+        counters, spans = self.snapshot()
+        lines = [f"# TYPE {prefix}_span_seconds summary"]
+        for name, (n, total, _) in sorted(spans.items()):
+            lines.append(f'{prefix}_span_seconds_count{{span="{name}"}} {n}')
+            lines.append(f'{prefix}_span_seconds_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f"# TYPE {prefix}_span_seconds_max gauge")
+        for name, (_, _, longest) in sorted(spans.items()):
+            lines.append(f'{prefix}_span_seconds_max{{span="{name}"}} {longest:.6f}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, n in sorted(counters.items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {n}')
+        with self._lock:
+            gauges = sorted(self.gauges.items())
+        lines.append(f"# TYPE {prefix}_gauge gauge")
+        for name, value in gauges:
+            lines.append(f'{prefix}_gauge{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+process = Metrics()
+_local = threading.local()
+_last_export = 0.0
+_export_lock = threading.Lock()
+
+
+def _record(name, seconds):
+    process.add_span(name, seconds)
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None:
+        rerun.append((name, seconds))
+        _local.session.add_span(name, seconds)
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing the block as `name`."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+def observe(name, seconds):
+    """Record a duration measured elsewhere, such as on another thread, as span `name`."""
+    if not ENABLED:
+        return
+    _record(name, seconds)
+
+
+def count(name, n=1):
+    """Add `n` to the counter `name`."""
+    if not ENABLED:
+        return
+    process.add(name, n)
+    session = getattr(_local, "session", None)
+    if session is not None:
+        session.add(name, n)
+
+
+def start_rerun(state):
+    """Collect spans and counters on this thread for the session owning `state`."""
+    if not ENABLED:
+        return
+    if "_metrics" not in state:
+        state["_metrics"] = Metrics()
+    _local.session = state["_metrics"]
+    _local.rerun = []
+    _local.started = time.perf_counter()
+
+
+def finish_rerun(state):
+    """Close the rerun started by `start_rerun`, keep its spans for the debug panel and export."""
+    if not ENABLED or getattr(_local, "rerun", None) is None:
+        return
+    _record("rerun", time.perf_counter() - _local.started)
+    state["_metrics_last_rerun"] = sorted(_local.rerun, key=lambda s: s[1], reverse=True)
+    _local.rerun = _local.session = None
+    maybe_export()
+
+
+def last_rerun(state):
+    """(name, seconds) spans of the session's last finished rerun, slowest first."""
+    return state.get("_metrics_last_rerun", [])
+
+
+def export(path=None):
+    """Write the process registry in Prometheus text format, atomically."""
+    path = path or data_path("metrics.prom")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(process.to_prometheus())
+    os.replace(tmp, path)
+    return path
+
+
+def maybe_export():
+    """Export if the last export is older than EXPORT_INTERVAL."""
+    global _last_export
+    now = time.monotonic()
+    if now - _last_export < EXPORT_INTERVAL:
+        return
+    with _export_lock:
+        if now - _last_export < EXPORT_INTERVAL:
+            return
+        _last_export = now
+    export()
@@ -0,0 +1,11 @@
+"""Location of the app's local data (caches, stores, indexes)."""
+import os
+
+DATA_DIR = os.environ.get("EUREKA_DATA_DIR", ".eureka")
+
+
+def data_path(*parts):
+    """Return a path under DATA_DIR, creating its parent directory."""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
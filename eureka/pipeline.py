@@ -0,0 +1,287 @@
+"""Offline preprocessing of a directory of PDFs into the artifacts the app reads.
+
+Each paper is parsed once and written under the data directory, keyed by its content
+hash, where the app looks for it:
+- `scores/<digest>.npz`: sentence text and scores, from which the Highlighter builds any
+  reader's highlights without rescoring.
+- `highlights/<digest>/<mode>.v<scoring version>.npz`: each reading mode's highlights for the default
+  profile, loaded by the Highlighter instead of built.
+- `sections/<digest>.json`: section map with summaries, read by the SectionIndex.
+- `search/<digest>.npz`: search index shard with every token's position and box, loaded
+  by the SearchLibrary at startup.
+- `library/shards/<digest>.json`: recommendation corpus record, written last. It marks the
+  paper as complete.
+
+A paper's artifacts depend only on its content and the pipeline's VERSION, which includes
+each artifact's format version, so a paper is processed again only when one of those
+changes.
+
+Papers are processed in parallel, one per core. The run appends each finished file to
+`library/checkpoint.jsonl`, so an interrupted run resumes where it stopped. A file whose
+path, size and mtime match its checkpoint line is skipped without being read. A file
+whose content hash is already complete, for example a copy or a rename, is read and
+hashed but not parsed. After a complete run the shards are merged into
+`library/corpus.jsonl` and indexed into `library/paper_index`. Point EUREKA_PAPER_CORPUS
+and EUREKA_PAPER_INDEX at them to recommend from the processed papers; merging again
+does not invalidate anything already processed:
+
+    python -m eureka.pipeline PDF_DIR [--data-dir DIR] [--workers N]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from eureka import paths
+from eureka.analytics import reading_minutes
+from eureka.annotations import FORMAT_VERSION as ANNOTATIONS_VERSION, AnnotationStore
+from eureka.assets import hash_bytes
+from eureka.explain import experience_bucket
+from eureka.highlights import DEFAULT_BUCKET, FORMAT_VERSION as SCORES_VERSION, MODES, PaperScores, highlights_path
+from eureka.ingest import IngestedPaper, parse_pdf
+from eureka.recommend import build_index, get_recommender
+from eureka.search import FORMAT_VERSION as SEARCH_VERSION, PaperIndex
+from eureka.sections import FORMAT_VERSION as SECTIONS_VERSION, split_sections
+
+# A paper processed with other artifact formats is processed again
+VERSION = [2, SCORES_VERSION, ANNOTATIONS_VERSION, SECTIONS_VERSION, SEARCH_VERSION]
+IN_FLIGHT = 4  # queued papers per worker
+PROGRESS_SECONDS = 5
+FSYNC_EVERY = 256
+ABSTRACT_WORDS = 120
+MAX_TOPICS = 2
+TITLE_HEADINGS = 3
+_ABSTRACT = re.compile(r"\babstract\b[\s.:—–-]*(.+)", re.IGNORECASE | re.DOTALL)
+
+
+def _write(path, data):
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(f"{path}.tmp", path)
+
+
+def _shard_path(digest):
+    return paths.data_path("library", "shards", f"{digest}.json")
+
+
+def _complete(digest):
+    """Whether every artifact of `digest` was written by this version of the pipeline."""
+    try:
+        with open(_shard_path(digest), "r", encoding="utf-8") as f:
+            return json.load(f).get("version") == VERSION
+    except (OSError, ValueError):
+        return False
+
+
+def use_data_dir(data_dir):
+    """Write artifacts under `data_dir`, in this process and in the worker processes it starts."""
+    os.environ["EUREKA_DATA_DIR"] = paths.DATA_DIR = data_dir
+
+
+def _ends_line(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _year(metadata):
+    found = re.match(r"(?:D:)?(\d{4})", metadata.get("creationDate") or "")
+    return int(found.group(1)) if found else 0
+
+
+def describe(paper, recommender):
+    """Recommendation corpus record of a parsed paper, from its metadata and first page."""
+    page = paper.pages[min(paper.pages)] if paper.pages else None
+    first = page.text if page is not None else ""
+    # Without a title in the metadata, the longest of the first headings skips journal banners and author lines
+    candidates = [title for title, _ in page.headings[:TITLE_HEADINGS]] if page is not None else []
+    candidates = candidates or [line.strip() for line in first.splitlines() if line.strip()][:1]
+    title = (paper.metadata.get("title") or "").strip() or max(candidates, key=len, default=paper.name or paper.digest)
+    found = _ABSTRACT.search(first)
+    abstract = " ".join((found.group(1) if found else first).split()[:ABSTRACT_WORDS])
+
+    # Topics whose corpus profile is closest to the paper's own TF-IDF vector
+    topics = recommender.topics_of(paper.text(), MAX_TOPICS) if recommender is not None else []
+    return {
+        "title": title,
+        "authors": (paper.metadata.get("author") or "").strip(),
+        "year": _year(paper.metadata),
+        "abstract": abstract,
+        "topics": topics,
+        "level": experience_bucket(None),
+        "citations": 0,
+        "reading_minutes": max(1, round(reading_minutes(paper.word_count))),
+        "digest": paper.digest,
+        "name": paper.name,
+    }
+
+
+def process(path):
+    """Build every artifact of the PDF at `path` unless its content is complete already; returns its digest."""
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hash_bytes(data)
+    if _complete(digest):
+        return digest, True
+    try:
+        recommender = get_recommender()
+    except (OSError, ValueError):
+        recommender = None
+
+    paper = IngestedPaper(digest, os.path.basename(path))
+    parse_pdf(paper, data)
+    paper._finish()
+
+    scores = PaperScores.from_paper(paper, recommender)
+    scores.save(paths.data_path("scores", f"{digest}.npz"))
+    for mode in MODES:
+        path = highlights_path(digest, mode)
+        AnnotationStore.from_records(scores.highlights(mode, DEFAULT_BUCKET)).save(f"{path}.tmp.npz")
+        os.replace(f"{path}.tmp.npz", path)
+    _write(paths.data_path("sections", f"{digest}.json"),
+           json.dumps({"version": SECTIONS_VERSION, "sections": split_sections(paper, scores)}, ensure_ascii=False))
+    PaperIndex.build(paper).save(paths.data_path("search", f"{digest}.npz"))
+    _write(_shard_path(digest), json.dumps(dict(describe(paper, recommender), version=VERSION), ensure_ascii=False))
+    return digest, False
+
+
+class Checkpoint:
+    """Append-only log of finished files, read back to resume an interrupted run."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}  # path -> (size, mtime_ns, digest)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # the last line of a killed run may be cut short
+                    if entry.get("version") == VERSION:
+                        self.done[entry["path"]] = (entry["size"], entry["mtime_ns"], entry["digest"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() and not _ends_line(path):
+            self._file.write("\n")  # so the next entry doesn't join the cut-short one
+        self._unsynced = 0
+
+    def finished(self, path, stat):
+        done = self.done.get(path)
+        return done is not None and done[:2] == (stat.st_size, stat.st_mtime_ns)
+
+    def record(self, path, stat, digest):
+        self.done[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        self._file.write(json.dumps({"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                     "digest": digest, "version": VERSION}) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= FSYNC_EVERY:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+
+def merge(digests):
+    """Concatenate the shards of `digests` into one corpus and build its recommendation index."""
+    corpus = paths.data_path("library", "corpus.jsonl")
+    with open(f"{corpus}.tmp", "w", encoding="utf-8") as out:
+        for i, digest in enumerate(digests):
+            with open(_shard_path(digest), "r", encoding="utf-8") as f:
+                shard = json.load(f)
+            shard.pop("version", None)
+            out.write(json.dumps(dict(shard, id=i), ensure_ascii=False) + "\n")
+    os.replace(f"{corpus}.tmp", corpus)
+    return build_index(corpus, os.path.dirname(paths.data_path("library", "paper_index", "manifest.json")))
+
+
+def run(pdf_dir, data_dir=None, workers=None, log=print):
+    """Process every PDF under `pdf_dir`, resuming from the checkpoint; returns a summary dict."""
+    if data_dir is not None:
+        use_data_dir(data_dir)
+    workers = workers or os.cpu_count() or 1
+    files = sorted(os.path.abspath(p) for p in glob.glob(os.path.join(pdf_dir, "**", "*.pdf"), recursive=True))
+    try:
+        # Built or checked once here, so the workers only memory-map it
+        get_recommender().topic_profiles()
+    except (OSError, ValueError):
+        pass
+
+    checkpoint = Checkpoint(paths.data_path("library", "checkpoint.jsonl"))
+    stats = {path: os.stat(path) for path in files}
+    todo = [path for path in files if not checkpoint.finished(path, stats[path])]
+    summary = {"papers": len(files), "resumed": len(files) - len(todo), "built": 0, "unchanged": 0, "failed": []}
+    log(f"{len(files)} PDFs, {summary['resumed']} done in an earlier run, {len(todo)} to check, {workers} workers")
+
+    started = last_report = time.monotonic()
+    pending = {}
+    queue = iter(todo)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            # Keep a few papers queued per worker rather than submitting all of them up front
+            for path in queue:
+                pending[pool.submit(process, path)] = path
+                if len(pending) >= workers * IN_FLIGHT:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = pending.pop(future)
+                try:
+                    digest, unchanged = future.result()
+                except Exception as e:
+                    summary["failed"].append(path)
+                    log(f"failed: {path}: {e}")
+                    continue
+                checkpoint.record(path, stats[path], digest)
+                summary["unchanged" if unchanged else "built"] += 1
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_SECONDS:
+                last_report = now
+                handled = summary["built"] + summary["unchanged"] + len(summary["failed"])
+                log(f"{handled}/{len(todo)} checked, {summary['built']} built, {summary['unchanged']} unchanged, "
+                    f"{len(summary['failed'])} failed, {handled / (now - started):.1f} papers/s")
+    except KeyboardInterrupt:
+        log("interrupted; run again to resume")
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        checkpoint.close()
+
+    digests = list(dict.fromkeys(checkpoint.done[path][2] for path in files if path in checkpoint.done))
+    summary["indexed"] = 0
+    # A run that found nothing new leaves the merged corpus as it was
+    if digests and (summary["built"] or summary["unchanged"]
+                    or not os.path.exists(paths.data_path("library", "corpus.jsonl"))):
+        summary["indexed"] = merge(digests)
+    summary["seconds"] = time.monotonic() - started
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess a directory of PDFs into the app's artifacts.")
+    parser.add_argument("pdf_dir")
+    parser.add_argument("--data-dir", default=None, help=f"where artifacts are written (default {paths.DATA_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+    if not os.path.isdir(args.pdf_dir):
+        sys.exit(f"{args.pdf_dir}: not a directory")
+    try:
+        summary = run(args.pdf_dir, args.data_dir, args.workers)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    print(f"{summary['built']} built, {summary['unchanged']} unchanged, {summary['resumed']} resumed, "
+          f"{len(summary['failed'])} failed; {summary['indexed']} papers indexed, in {summary['seconds']:.1f}s")
+    sys.exit(1 if summary["failed"] else 0)
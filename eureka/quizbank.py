@@ -0,0 +1,109 @@
+"""Quiz questions stored on disk and graded in batches.
+
+The bank is a JSON list of `{id, topic, difficulty, question, options, correct}` items
+in `quizzes/questions.json`, with an optional IRT `discrimination` (default 1.0). It is
+loaded once per process the first time a page asks for it. Topic, difficulty and the
+answer key are held as NumPy columns, so a whole cohort's submissions can be scored, and
+per-question statistics produced, in a single call.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+BANK_PATH = os.environ.get("EUREKA_QUIZ_BANK", "quizzes/questions.json")
+UNANSWERED = -1
+
+
+class GradeReport:
+    """Result of grading `answers[learner, question]` against the answer key."""
+
+    def __init__(self, question_ids, answers, correct, n_options):
+        self.question_ids = question_ids
+        self.answers = answers
+        self.correct = correct  # bool [learners, questions]
+        answered = answers != UNANSWERED
+        self.scores = correct.sum(axis=1)
+        self.answered = answered.sum(axis=1)
+        # Share of learners answering each question correctly (classical item difficulty)
+        self.p_correct = correct.mean(axis=0) if len(answers) else np.zeros(len(question_ids))
+        # How often each option was picked, per question: [questions, max_options]
+        picked = np.where(answered, answers, n_options.max(initial=0))
+        counts = np.zeros((len(question_ids), n_options.max(initial=0) + 1), dtype=np.int64)
+        np.add.at(counts, (np.broadcast_to(np.arange(len(question_ids)), picked.shape), picked), 1)
+        self.option_counts = counts[:, :-1]
+
+    def wrong(self, learner=0):
+        """Positions (within the graded questions) that `learner` got wrong."""
+        return np.flatnonzero(~self.correct[learner])
+
+
+class QuizBank:
+    """Read-only question bank indexed by topic and difficulty."""
+
+    def __init__(self, questions):
+        self.questions = questions
+        self.topics = sorted({q["topic"] for q in questions})
+        topic_code = {t: i for i, t in enumerate(self.topics)}
+        self.topic = np.array([topic_code[q["topic"]] for q in questions], dtype=np.int16)
+        self.difficulty = np.array([q.get("difficulty", 0.0) for q in questions], dtype=np.float32)
+        self.discrimination = np.array([q.get("discrimination", 1.0) for q in questions], dtype=np.float32)
+        self.key = np.array([q["correct"] for q in questions], dtype=np.int8)
+        self.n_options = np.array([len(q["options"]) for q in questions], dtype=np.int8)
+        self._topic_code = topic_code
+        # Question ids grouped by topic, each group sorted by difficulty
+        order = np.lexsort((self.difficulty, self.topic))
+        bounds = np.searchsorted(self.topic[order], np.arange(len(self.topics) + 1))
+        self._by_topic = {t: order[bounds[i]:bounds[i + 1]] for i, t in enumerate(self.topics)}
+
+    @classmethod
+    def load(cls, path=BANK_PATH):
+        with open(path, "r") as f:
+            questions = json.load(f)
+        for i, q in enumerate(questions):
+            if q.get("id", i) != i:
+                raise ValueError(f"{path}: question ids must match their position (item {i} has id {q['id']})")
+        return cls(questions)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def by_topic(self, topic, min_difficulty=None, max_difficulty=None):
+        """Ids of the questions on `topic`, easiest first, optionally within a difficulty range."""
+        ids = self._by_topic.get(topic, np.zeros(0, dtype=np.intp))
+        if min_difficulty is not None:
+            ids = ids[self.difficulty[ids] >= min_difficulty]
+        if max_difficulty is not None:
+            ids = ids[self.difficulty[ids] <= max_difficulty]
+        return ids
+
+    def get(self, ids):
+        return [self.questions[i] for i in ids]
+
+    def grade(self, question_ids, answers):
+        """Grade a batch of submissions.
+
+        `answers` is a [learners, questions] array of chosen option indices for the
+        questions in `question_ids`, with UNANSWERED (-1) for skipped questions.
+        """
+        question_ids = np.asarray(question_ids, dtype=np.intp)
+        answers = np.atleast_2d(np.asarray(answers, dtype=np.int8))
+        if answers.shape[1] != len(question_ids):
+            raise ValueError(f"expected answers for {len(question_ids)} questions, got {answers.shape[1]}")
+        correct = answers == self.key[question_ids]
+        return GradeReport(question_ids, answers, correct, self.n_options[question_ids])
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_quiz_bank():
+    """Return the process-wide QuizBank, loading it on first use."""
+    global _bank
+    if _bank is None:
+        with _bank_lock:
+            if _bank is None:
+                _bank = QuizBank.load()
+    return _bank
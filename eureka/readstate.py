@@ -0,0 +1,146 @@
+"""Per-paragraph read state: which passages a reader has seen, understood or wants to revisit.
+
+A paper's paragraphs are the text blocks found during ingestion, numbered in reading
+order once per paper. A reader's marks on a paper are three bitmaps with one bit per
+paragraph, so the marks of a 500-paragraph paper take under 200 bytes. A click flips one
+bit, and the store saves the three bitmaps as one row per (reader, paper) behind the page.
+Revisiting mode reads the set bits of the Revisit bitmap directly, so it never needs the
+reader's click history.
+"""
+import threading
+from collections import OrderedDict
+
+from eureka.store import get_store
+
+SEEN, UNDERSTOOD, REVISIT = "seen", "understood", "revisit"
+MARKS = (SEEN, UNDERSTOOD, REVISIT)
+MAX_PAPERS = 64
+REVISIT_COLOR = "rgba(255, 99, 71, 1)"
+REVISIT_BORDER = "solid"
+
+
+class Paragraphs:
+    """Text blocks of a parsed paper in reading order, with their page and box."""
+
+    def __init__(self, pages, boxes, blocks=None):
+        self.pages = pages
+        self.boxes = boxes  # (x0, y0, x1, y1) of each paragraph
+        self.blocks = blocks  # text block number of each paragraph on its page
+        self._ranges = {}  # page -> (first, end) paragraph numbers
+        for i, page in enumerate(pages):
+            first, _ = self._ranges.get(page, (i, i))
+            self._ranges[page] = (first, i + 1)
+
+    def __len__(self):
+        return len(self.pages)
+
+    @classmethod
+    def from_paper(cls, paper):
+        pages, boxes, block_numbers = [], [], []
+        for number in sorted(paper.pages):
+            blocks = {}
+            for x0, y0, x1, y1, _, block_no, _, _ in paper.pages[number].words:
+                box = blocks.get(block_no)
+                blocks[block_no] = (x0, y0, x1, y1) if box is None else (
+                    min(box[0], x0), min(box[1], y0), max(box[2], x1), max(box[3], y1))
+            for block_no in sorted(blocks):
+                pages.append(number)
+                boxes.append(blocks[block_no])
+                block_numbers.append(block_no)
+        return cls(pages, boxes, block_numbers)
+
+    def locate(self, page, x, y, width=0, height=0):
+        """Number of the paragraph holding the centre of a rectangle on `page`, else the nearest one, or None."""
+        first, end = self._ranges.get(page, (0, 0))
+        if first == end:
+            return None
+        cx, cy = x + width / 2, y + height / 2
+
+        def distance(i):
+            x0, y0, x1, y1 = self.boxes[i]
+            return max(x0 - cx, 0, cx - x1) + max(y0 - cy, 0, cy - y1)
+
+        return min(range(first, end), key=distance)
+
+    def selection(self, paper, i):
+        """((page, first word, last word), text) of paragraph `i` of `paper`."""
+        words = paper.pages[self.pages[i]].words
+        span = [k for k, word in enumerate(words) if word[5] == self.blocks[i]]
+        return (self.pages[i], span[0], span[-1]), " ".join(words[k][4] for k in span)
+
+    def records(self, numbers, color=REVISIT_COLOR, border=REVISIT_BORDER):
+        """Annotation records outlining the given paragraphs."""
+        return [{"page": self.pages[i], "x": x0, "y": y0, "width": x1 - x0, "height": y1 - y0,
+                 "color": color, "border": border}
+                for i in numbers for x0, y0, x1, y1 in [self.boxes[i]]]
+
+
+class ReadState:
+    """Seen, Understood and Revisit bitmaps of one reader's paragraphs of one paper."""
+
+    def __init__(self, paragraphs, bitmaps=None):
+        self.paragraphs = paragraphs
+        size = (paragraphs + 7) // 8
+        # Saved marks for a different paragraph split can't be mapped onto this one
+        if bitmaps is None or any(len(bitmaps[m]) != size for m in MARKS):
+            bitmaps = {m: b"" for m in MARKS}
+        self.bitmaps = {m: bytearray(bitmaps[m]) or bytearray(size) for m in MARKS}
+        self.version = 0
+
+    def has(self, mark, i):
+        return bool(self.bitmaps[mark][i >> 3] >> (i & 7) & 1)
+
+    def mark(self, mark, i, on=True):
+        """Set or clear one paragraph's mark; returns whether it changed."""
+        bits = self.bitmaps[mark]
+        before = bits[i >> 3]
+        bits[i >> 3] = before | (1 << (i & 7)) if on else before & ~(1 << (i & 7))
+        if bits[i >> 3] == before:
+            return False
+        self.version += 1
+        return True
+
+    def marked(self, mark):
+        """Numbers of the paragraphs carrying `mark`, in reading order."""
+        return [byte << 3 | bit for byte, value in enumerate(self.bitmaps[mark]) if value
+                for bit in range(8) if value >> bit & 1]
+
+    def count(self, mark):
+        return int.from_bytes(self.bitmaps[mark], "little").bit_count()
+
+    def to_state(self):
+        return {m: bytes(self.bitmaps[m]) for m in MARKS}
+
+
+_paragraphs = OrderedDict()
+_paragraphs_lock = threading.Lock()
+
+
+def get_paragraphs(paper):
+    """Paragraphs of a fully parsed `paper`, split once per process."""
+    with _paragraphs_lock:
+        paragraphs = _paragraphs.get(paper.digest)
+        if paragraphs is not None:
+            _paragraphs.move_to_end(paper.digest)
+            return paragraphs
+    paragraphs = Paragraphs.from_paper(paper)
+    with _paragraphs_lock:
+        _paragraphs[paper.digest] = paragraphs
+        while len(_paragraphs) > MAX_PAPERS:
+            _paragraphs.popitem(last=False)
+    return paragraphs
+
+
+def session_read_state(state, paper):
+    """The reader's ReadState of `paper` from Streamlit session state, loaded from the store the first time."""
+    states = state.setdefault("read_state", {})
+    read_state = states.get(paper.digest)
+    if read_state is None:
+        saved = get_store().read_state(state["uid"], paper.digest)
+        read_state = states[paper.digest] = ReadState(len(get_paragraphs(paper)), saved)
+    return read_state
+
+
+def save_read_state(state, paper):
+    """Queue the reader's marks on `paper` for saving."""
+    get_store().save_read_state(state["uid"], paper.digest, state["read_state"][paper.digest].to_state())
@@ -0,0 +1,229 @@
+"""Paper recommendations from a TF-IDF index over a local corpus.
+
+The corpus is a JSON-lines file of papers (`papers/corpus.jsonl` ships a small sample
+with illustrative metadata) with `title`, `authors`, `year`, `abstract`, `topics`,
+`level`, `citations` and `reading_minutes`. `build_index` turns it offline into flat
+NumPy arrays: term postings with L2-normalised TF-IDF weights, plus one column per filter
+and sort key. At startup the arrays are memory-mapped, so the index is not parsed or
+copied into each process. A query adds up the postings of its terms, masks by topic and
+level, and picks the top k with `argpartition`:
+
+    python -m eureka.recommend build papers/corpus.jsonl .eureka/paper_index
+"""
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+from collections import Counter
+
+import numpy as np
+
+from eureka.knowledge import TOPIC_INDEX, TOPICS
+from eureka.paths import data_path
+from eureka.text import terms
+
+CORPUS_PATH = os.environ.get("EUREKA_PAPER_CORPUS", "papers/corpus.jsonl")
+INDEX_VERSION = 1
+LEVELS = ["Beginner", "Intermediate", "Advanced", "Expert"]
+SORT_OPTIONS = ["Relevance", "Publication Date", "Citation Count", "Reading Time"]
+_COLUMNS = ("year", "citations", "reading_minutes", "level", "topics")
+
+
+def _file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _document_terms(paper):
+    # Titles count twice; topics are indexed as words so topic names match queries.
+    text = " ".join([paper["title"], paper["title"], paper.get("abstract", ""), " ".join(paper.get("topics", []))])
+    return Counter(terms(text))
+
+
+def build_index(corpus_path, index_dir):
+    """Build the recommendation index for `corpus_path` into `index_dir`."""
+    os.makedirs(index_dir, exist_ok=True)
+    vocab, df, doc_terms, offsets = {}, Counter(), [], []
+    columns = {c: [] for c in _COLUMNS}
+    meta_path = os.path.join(index_dir, "meta.jsonl")
+    with open(corpus_path, "r") as src, open(meta_path, "wb") as meta:
+        for line in src:
+            if not line.strip():
+                continue
+            paper = json.loads(line)
+            tf = _document_terms(paper)
+            doc_terms.append({vocab.setdefault(t, len(vocab)): n for t, n in tf.items()})
+            df.update(doc_terms[-1].keys())
+            columns["year"].append(paper.get("year", 0))
+            columns["citations"].append(paper.get("citations", 0))
+            columns["reading_minutes"].append(paper.get("reading_minutes", 0))
+            columns["level"].append(LEVELS.index(paper.get("level", "Intermediate")))
+            columns["topics"].append(sum(1 << TOPIC_INDEX[t] for t in paper.get("topics", []) if t in TOPIC_INDEX))
+            offsets.append(meta.tell())
+            meta.write(json.dumps(paper, ensure_ascii=False).encode() + b"\n")
+
+    n_docs = len(doc_terms)
+    idf = np.array([math.log((1 + n_docs) / (1 + df[t])) + 1 for t in range(len(vocab))], dtype=np.float32)
+    term_ids, doc_ids, weights = [], [], []
+    for doc, tf in enumerate(doc_terms):
+        ids = np.fromiter(tf.keys(), dtype=np.int32, count=len(tf))
+        w = (1 + np.log(np.fromiter(tf.values(), dtype=np.float32, count=len(tf)))) * idf[ids]
+        term_ids.append(ids)
+        doc_ids.append(np.full(len(ids), doc, dtype=np.int32))
+        weights.append(w / (np.linalg.norm(w) or 1.0))
+    term_ids = np.concatenate(term_ids) if term_ids else np.zeros(0, np.int32)
+    doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, np.int32)
+    weights = np.concatenate(weights) if weights else np.zeros(0, np.float32)
+    order = np.argsort(term_ids, kind="stable")
+    ptr = np.searchsorted(term_ids[order], np.arange(len(vocab) + 1)).astype(np.int64)
+
+    arrays = {
+        "postings_ptr": ptr,
+        "postings_doc": doc_ids[order],
+        "postings_weight": weights[order],
+        "meta_offsets": np.array(offsets, dtype=np.int64),
+        "year": np.array(columns["year"], dtype=np.int16),
+        "citations": np.array(columns["citations"], dtype=np.int32),
+        "reading_minutes": np.array(columns["reading_minutes"], dtype=np.int16),
+        "level": np.array(columns["level"], dtype=np.int8),
+        "topics": np.array(columns["topics"], dtype=np.uint16),
+        "idf": idf,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(index_dir, f"{name}.npy"), array)
+    # The manifest is written last, so a half-built index is never picked up.
+    with open(os.path.join(index_dir, "manifest.json"), "w") as f:
+        json.dump({
+            "version": INDEX_VERSION,
+            "corpus_digest": _file_digest(corpus_path),
+            "n_docs": n_docs,
+            "vocab": vocab,
+        }, f)
+    return n_docs
+
+
+class Recommender:
+    """Memory-mapped recommendation index."""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        if manifest["version"] != INDEX_VERSION:
+            raise ValueError(f"{index_dir}: index version {manifest['version']} != {INDEX_VERSION}")
+        self.corpus_digest = manifest["corpus_digest"]
+        self.n_docs = manifest["n_docs"]
+        self.vocab = manifest["vocab"]
+        load = lambda name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+        self.postings_ptr = load("postings_ptr")
+        self.postings_doc = load("postings_doc")
+        self.postings_weight = load("postings_weight")
+        self.meta_offsets = load("meta_offsets")
+        self.idf = load("idf")
+        for column in _COLUMNS:
+            setattr(self, column, load(column))
+        self._topic_profiles = None
+
+    def scores(self, query):
+        """Cosine similarity between `query` and every paper."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        tf = Counter(t for t in terms(query) if t in self.vocab)
+        if not tf:
+            return scores
+        ids = np.array([self.vocab[t] for t in tf], dtype=np.intp)
+        qw = (1 + np.log(np.array(list(tf.values()), dtype=np.float32))) * self.idf[ids]
+        qw /= np.linalg.norm(qw)
+        for term, w in zip(ids, qw):
+            lo, hi = self.postings_ptr[term], self.postings_ptr[term + 1]
+            # A paper appears at most once per term, so plain fancy-index addition is safe.
+            scores[self.postings_doc[lo:hi]] += w * self.postings_weight[lo:hi]
+        return scores
+
+    def recommend(self, query="", topics=(), level=None, sort="Relevance", k=5, exclude=()):
+        """Top `k` papers as dicts (with a `score`), filtered by topic and by level within one step."""
+        mask = np.ones(self.n_docs, dtype=bool)
+        if topics:
+            wanted = sum(1 << TOPIC_INDEX[t] for t in topics if t in TOPIC_INDEX)
+            mask &= (self.topics & wanted) != 0
+        if level is not None:
+            mask &= np.abs(self.level.astype(np.int16) - LEVELS.index(level)) <= 1
+        if len(exclude):
+            mask[np.asarray(exclude, dtype=np.intp)] = False
+        scores = self.scores(query)
+        if sort != "Relevance" and (scores[mask] > 0).any():
+            mask &= scores > 0
+
+        # Relevance breaks ties by citations; the other orders break ties by relevance.
+        if sort == "Relevance":
+            key = scores + 1e-9 * np.log1p(self.citations)
+        elif sort == "Publication Date":
+            key = self.year + 1e-3 * scores
+        elif sort == "Citation Count":
+            key = self.citations + 1e-3 * scores
+        elif sort == "Reading Time":
+            key = -(self.reading_minutes.astype(np.float32)) + 1e-3 * scores
+        else:
+            raise ValueError(f"unknown sort option {sort!r}; expected one of {SORT_OPTIONS}")
+        candidates = np.flatnonzero(mask)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-key[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-key[candidates], kind="stable")]
+        return [dict(self.paper(int(i)), score=float(scores[i])) for i in candidates]
+
+    def topic_profiles(self):
+        """(topics, terms) matrix of the L2-normalised summed TF-IDF vectors of each topic's papers."""
+        if self._topic_profiles is None:
+            term_of = np.repeat(np.arange(len(self.vocab)), np.diff(self.postings_ptr))
+            doc_topics = self.topics[self.postings_doc]
+            profiles = np.zeros((len(TOPICS), len(self.vocab)), dtype=np.float32)
+            for t in range(len(TOPICS)):
+                on = (doc_topics >> t) & 1 == 1
+                profiles[t] = np.bincount(term_of[on], weights=self.postings_weight[on], minlength=len(self.vocab))
+            norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+            self._topic_profiles = profiles / np.where(norms > 0, norms, 1)
+        return self._topic_profiles
+
+    def topics_of(self, text, n):
+        """Up to `n` topics whose profile is closest to the TF-IDF vector of `text`, closest first."""
+        tf = Counter(t for t in terms(text) if t in self.vocab)
+        if not tf:
+            return []
+        ids = np.fromiter((self.vocab[t] for t in tf), dtype=np.intp, count=len(tf))
+        w = (1 + np.log(np.fromiter(tf.values(), dtype=np.float32, count=len(tf)))) * self.idf[ids]
+        similarity = self.topic_profiles()[:, ids] @ (w / np.linalg.norm(w))
+        return [TOPICS[t] for t in np.argsort(-similarity)[:n] if similarity[t] > 0]
+
+    def paper(self, i):
+        with open(os.path.join(self.index_dir, "meta.jsonl"), "rb") as f:
+            f.seek(self.meta_offsets[i])
+            return json.loads(f.readline())
+
+
+_recommender = None
+_recommender_lock = threading.Lock()
+
+
+def get_recommender():
+    """Return the process-wide Recommender, (re)building the index if the corpus changed."""
+    global _recommender
+    if _recommender is None:
+        with _recommender_lock:
+            if _recommender is None:
+                index_dir = os.environ.get("EUREKA_PAPER_INDEX") or os.path.dirname(data_path("paper_index", "manifest.json"))
+                manifest = os.path.join(index_dir, "manifest.json")
+                stale = not os.path.exists(manifest)
+                if not stale:
+                    with open(manifest, "r") as f:
+                        stale = json.load(f).get("corpus_digest") != _file_digest(CORPUS_PATH)
+                if stale:
+                    build_index(CORPUS_PATH, index_dir)
+                _recommender = Recommender(index_dir)
+    return _recommender
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        sys.exit("usage: python -m eureka.recommend build CORPUS.jsonl INDEX_DIR")
+    print(f"Indexed {build_index(sys.argv[2], sys.argv[3])} papers into {sys.argv[3]}")
@@ -0,0 +1,275 @@
+"""Full-text search over parsed papers, with hits as highlight rectangles.
+
+Each paper gets a positional index, built once per content hash and saved to
+`<data dir>/search/<digest>.npz`:
+- Its sorted term list with CSR postings of token positions.
+- For every position, the page, text line and word box it came from.
+
+The library keeps one global term dictionary. For each term it stores the papers that
+contain it and how often, and each paper maps the global term ids to its own postings
+with a sorted array. A query is a phrase of tokens, and a token ending in `*` matches as
+a prefix. The query first bounds each paper's matches by its rarest token's count, then
+visits papers from the highest bound down, intersecting the position arrays shifted by
+each token's offset, until `limit` hits are found. Hits come back with their page and one
+rectangle per text line, in the annotations' record format, so they can be overlaid in
+the viewer directly.
+"""
+import bisect
+import glob
+import os
+import threading
+
+import numpy as np
+
+from eureka import metrics
+from eureka.paths import data_path
+from eureka.text import tokenize
+
+FORMAT_VERSION = 1
+MAX_PREFIX_TERMS = 256
+HIT_COLOR = "rgba(255, 215, 0, 1)"
+HIT_BORDER = "dashed"
+SNIPPET_TOKENS = 6
+
+
+class PaperIndex:
+    """Positional postings of one paper."""
+
+    def __init__(self, digest, name, terms, ptr, positions, tokens, page, line, boxes):
+        self.digest = digest
+        self.name = name
+        self.terms = terms  # sorted list of the paper's terms
+        self.ptr = ptr  # postings of term i are positions[ptr[i]:ptr[i + 1]]
+        self.positions = positions
+        self.tokens = tokens  # term index at each position
+        self.page = page
+        self.line = line  # running text line number at each position
+        self.boxes = boxes  # (positions, 4) word box x0, y0, x1, y1
+        self.gids = None  # global term id of each term, set by the library
+        self._gid_order = None
+
+    @classmethod
+    def build(cls, paper):
+        """Index the words of a fully parsed IngestedPaper."""
+        tokens, page, line, boxes = [], [], [], []
+        line_no = 0
+        for number in sorted(paper.pages):
+            last = None
+            for x0, y0, x1, y1, word, block_no, word_line, _ in paper.pages[number].words:
+                if (block_no, word_line) != last:
+                    line_no += 1
+                    last = (block_no, word_line)
+                for token in tokenize(word):
+                    tokens.append(token)
+                    page.append(number)
+                    line.append(line_no)
+                    boxes.append((x0, y0, x1, y1))
+        terms = sorted(set(tokens))
+        index = {t: i for i, t in enumerate(terms)}
+        term_ids = np.fromiter((index[t] for t in tokens), dtype=np.int32, count=len(tokens))
+        # A stable sort groups each term's positions in increasing order
+        positions = np.argsort(term_ids, kind="stable").astype(np.int32)
+        ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=ptr[1:])
+        return cls(paper.digest, paper.name, terms, ptr, positions, term_ids,
+                   np.array(page, dtype=np.int32), np.array(line, dtype=np.int32),
+                   np.array(boxes, dtype=np.float32).reshape(-1, 4))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            if int(z["version"]) != FORMAT_VERSION:
+                raise ValueError(f"{path}: search index version {int(z['version'])} != {FORMAT_VERSION}")
+            return cls(str(z["digest"]), str(z["name"]) or None, z["terms"].tolist(), z["ptr"], z["positions"],
+                       z["tokens"], z["page"], z["line"], z["boxes"])
+
+    def save(self, path):
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, version=FORMAT_VERSION, digest=self.digest, name=self.name or "",
+                 terms=np.array(self.terms, dtype=str), ptr=self.ptr, positions=self.positions,
+                 tokens=self.tokens, page=self.page, line=self.line, boxes=self.boxes)
+        os.replace(tmp, path)
+
+    def _attach(self, gids):
+        self.gids = gids
+        self._gid_order = np.argsort(gids, kind="stable")
+        self._gids_sorted = gids[self._gid_order]
+
+    def postings(self, gids):
+        """Sorted positions of any of the global term ids `gids`."""
+        k = np.searchsorted(self._gids_sorted, gids)
+        k = k[(k < len(self._gids_sorted))]
+        local = self._gid_order[k[np.isin(self._gids_sorted[k], gids)]]
+        if len(local) == 1:
+            return self.positions[self.ptr[local[0]]:self.ptr[local[0] + 1]]
+        return np.sort(np.concatenate([self.positions[self.ptr[t]:self.ptr[t + 1]] for t in local]
+                                      or [np.zeros(0, dtype=np.int32)]))
+
+    def match(self, token_gids):
+        """Start positions where the tokens (each a list of acceptable global ids) occur in order."""
+        starts = self.postings(token_gids[0])
+        for offset, gids in enumerate(token_gids[1:], 1):
+            if not len(starts):
+                break
+            starts = np.intersect1d(starts, self.postings(gids) - offset, assume_unique=True)
+        return starts
+
+    def hit(self, start, length):
+        """Page, annotation rectangles and snippet of the match at `start` spanning `length` tokens."""
+        span = slice(start, start + length)
+        rects = {}
+        for line, page, (x0, y0, x1, y1) in zip(self.line[span], self.page[span], self.boxes[span]):
+            box = rects.get(line)
+            rects[line] = (page, x0, y0, x1, y1) if box is None else (
+                page, min(box[1], x0), min(box[2], y0), max(box[3], x1), max(box[4], y1))
+        around = range(max(start - SNIPPET_TOKENS, 0), min(start + length + SNIPPET_TOKENS, len(self.tokens)))
+        return {
+            "paper": self.digest,
+            "name": self.name,
+            "page": int(self.page[start]),
+            "rects": [{"page": int(p), "x": float(x0), "y": float(y0), "width": float(x1 - x0),
+                       "height": float(y1 - y0), "color": HIT_COLOR, "border": HIT_BORDER}
+                      for p, x0, y0, x1, y1 in rects.values()],
+            "snippet": " ".join(self.terms[self.tokens[p]] for p in around),
+        }
+
+
+def parse_query(query):
+    """(token, is_prefix) pairs of a query; a trailing `*` makes a token a prefix."""
+    parsed = []
+    for part in query.split():
+        prefix = part.endswith("*")
+        tokens = tokenize(part)
+        for i, token in enumerate(tokens):
+            parsed.append((token, prefix and i == len(tokens) - 1))
+    return parsed
+
+
+class SearchLibrary:
+    """All indexed papers of this process, searchable one at a time or together."""
+
+    def __init__(self, index_dir=None):
+        self.index_dir = index_dir
+        self._papers = []  # slot -> PaperIndex
+        self._slots = {}  # digest -> slot
+        self._gids = {}  # term -> global id
+        self._term_slots = []  # global id -> slots of the papers holding the term
+        self._term_counts = []  # global id -> occurrences in each of those papers
+        self._term_arrays = {}  # global id -> both of the above as arrays, rebuilt after changes
+        self._vocab = None  # terms sorted for prefix lookups, rebuilt after new terms
+        self._lock = threading.RLock()
+        self._loaded = index_dir is None
+
+    def _load_saved(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            for path in glob.glob(os.path.join(self.index_dir, "*.npz")):
+                try:
+                    self._register(PaperIndex.load(path))
+                except (OSError, ValueError, KeyError):
+                    continue
+
+    def _register(self, index):
+        slot = len(self._papers)
+        counts = np.diff(index.ptr).tolist()
+        gids = [self._gids.get(term) for term in index.terms]
+        for i, gid in enumerate(gids):
+            if gid is None:
+                gid = gids[i] = self._gids[index.terms[i]] = len(self._term_slots)
+                self._term_slots.append([])
+                self._term_counts.append([])
+                self._vocab = None
+            self._term_slots[gid].append(slot)
+            self._term_counts[gid].append(counts[i])
+            self._term_arrays.pop(gid, None)
+        index._attach(np.array(gids, dtype=np.int64))
+        self._papers.append(index)
+        self._slots[index.digest] = slot
+
+    def add(self, paper):
+        """Index a fully parsed IngestedPaper unless its content hash is indexed already."""
+        self._load_saved()
+        with self._lock:
+            slot = self._slots.get(paper.digest)
+        if slot is not None:
+            return self._papers[slot]
+        with metrics.span("search.index_paper"):
+            index = PaperIndex.build(paper)
+        if self.index_dir is not None:
+            index.save(os.path.join(self.index_dir, f"{paper.digest}.npz"))
+        with self._lock:
+            if paper.digest not in self._slots:
+                self._register(index)
+            return self._papers[self._slots[paper.digest]]
+
+    def __contains__(self, digest):
+        return digest in self._slots
+
+    def _token_gids(self, token, prefix):
+        if not prefix:
+            gid = self._gids.get(token)
+            return [] if gid is None else [gid]
+        if self._vocab is None:
+            self._vocab = sorted(self._gids)
+        lo = bisect.bisect_left(self._vocab, token)
+        hi = bisect.bisect_left(self._vocab, token + "\uffff", lo)
+        return [self._gids[t] for t in self._vocab[lo:min(hi, lo + MAX_PREFIX_TERMS)]]
+
+    def _occurrences(self, gids):
+        """Occurrences of any of `gids` in every paper slot."""
+        counts = np.zeros(len(self._papers), dtype=np.int64)
+        for gid in gids:
+            arrays = self._term_arrays.get(gid)
+            if arrays is None:
+                arrays = self._term_arrays[gid] = (np.array(self._term_slots[gid], dtype=np.intp),
+                                                   np.array(self._term_counts[gid], dtype=np.int64))
+            # A paper holds a term once, so plain fancy-index addition is safe.
+            counts[arrays[0]] += arrays[1]
+        return counts
+
+    def search(self, query, papers=None, limit=50):
+        """Hits of `query` in the given paper digests (default: every paper), likeliest papers first."""
+        self._load_saved()
+        parsed = parse_query(query)
+        if not parsed:
+            return []
+        with metrics.span("search.query"), self._lock:
+            token_gids = [np.array(self._token_gids(t, p), dtype=np.int64) for t, p in parsed]
+            if any(not len(g) for g in token_gids):
+                return []
+            # A paper can't match the phrase more often than its rarest token occurs in it
+            bound = None
+            for gids in token_gids:
+                counts = self._occurrences(gids)
+                bound = counts if bound is None else np.minimum(bound, counts)
+            if papers is not None:
+                wanted = np.zeros(len(self._papers), dtype=bool)
+                wanted[[self._slots[d] for d in papers if d in self._slots]] = True
+                bound[~wanted] = 0
+            candidates = np.flatnonzero(bound)
+            candidates = candidates[np.argsort(-bound[candidates], kind="stable")]
+
+            hits = []
+            for slot in candidates:
+                index = self._papers[slot]
+                for start in index.match(token_gids)[:limit - len(hits)]:
+                    hits.append(index.hit(int(start), len(parsed)))
+                if len(hits) >= limit:
+                    break
+            return hits
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_search_library():
+    """Return the process-wide SearchLibrary, persisted under the data directory."""
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                _library = SearchLibrary(os.path.dirname(data_path("search", "index")))
+    return _library
@@ -0,0 +1,179 @@
+"""Paper sections with one-line summaries, for collapsing what a reader already knows.
+
+A parsed paper is split once into sections at the headings found during ingestion, in
+reading order (headings are matched to their text blocks, so two-column pages keep their
+order). Each section keeps its start page and block, a one-line summary (its most
+important sentence, from `eureka.highlights`) and its familiarity for each topic. The
+result is cached per process and saved under the data directory, keyed by the paper's
+content hash.
+
+At view time `collapsed` only combines that cached data with the reader's profile bucket,
+and the answer is memoised per (paper, bucket), so Exploratory mode costs nothing extra
+per rerun.
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from eureka.highlights import get_highlighter, profile_bucket
+from eureka.knowledge import TOPICS
+from eureka.paths import data_path
+
+FORMAT_VERSION = 2
+MAX_PAPERS = 64
+SUMMARY_WORDS = 25
+# A body section is collapsed once the reader's familiarity with it (the mean over its
+# sentences, for the best-known of their topics) reaches their level's threshold. Only
+# Intermediate readers and above have body sections collapsed; Beginners see every
+# section, and every level has back matter collapsed.
+COLLAPSE_AT = {"Beginner": None, "Intermediate": 0.6, "Advanced": 0.5, "Expert": 0.4}
+_BACK_MATTER = re.compile(
+    r"^(references|bibliography|acknowledge?ments?|funding|declaration|conflicts? of interest|notes?)\b",
+    re.IGNORECASE,
+)
+
+
+def _squash(text):
+    return re.sub(r"[\s\-‐]+", "", text).lower()
+
+
+def _heading_blocks(page, headings):
+    """Block number of each (title, y) heading on a PageResult, matched by text, else by position."""
+    blocks = {}
+    for x0, y0, x1, y1, word, block_no, _, _ in page.words:
+        text, top = blocks.get(block_no, ("", y0))
+        blocks[block_no] = (text + word, min(top, y0))
+    found = []
+    for title, y in headings:
+        want = _squash(title)
+        match = next((b for b, (text, _) in blocks.items() if _squash(text) == want), None)
+        if match is None and blocks:
+            match = min(blocks, key=lambda b: abs(blocks[b][1] - y))
+        if match is not None:
+            found.append((title, match))
+    return found
+
+
+def summarize(texts, importance):
+    """The most important of a section's sentences, cut to SUMMARY_WORDS words."""
+    if not texts:
+        return ""
+    words = texts[max(range(len(texts)), key=importance.__getitem__)].split()
+    return " ".join(words[:SUMMARY_WORDS]) + ("…" if len(words) > SUMMARY_WORDS else "")
+
+
+def split_sections(paper, scores):
+    """Section dicts of a fully parsed `paper`, given its PaperScores."""
+    starts = [(0, -1, "")]  # text before the first heading
+    for number in sorted(paper.pages):
+        page = paper.pages[number]
+        for title, block in _heading_blocks(page, page.headings):
+            starts.append((number, block, title))
+    starts.sort(key=lambda s: s[:2])
+
+    sections = []
+    for i, (page, block, title) in enumerate(starts):
+        end = starts[i + 1][:2] if i + 1 < len(starts) else (float("inf"), 0)
+        members = [j for j in range(len(scores.texts))
+                   if (page, block) <= (scores.pages[j], scores.blocks[j]) < end]
+        if not title and not members:
+            continue
+        familiarity = scores.familiarity[members].mean(axis=0) if members else [0.0] * len(TOPICS)
+        sections.append({
+            "title": title or "Opening",
+            "page": max(page, 1),
+            "end_page": int(scores.pages[members[-1]]) if members else max(page, 1),
+            "next_page": end[0] if i + 1 < len(starts) else None,
+            "summary": summarize([scores.texts[j] for j in members], [scores.importance[j] for j in members]),
+            "sentences": len(members),
+            "familiarity": [round(float(f), 4) for f in familiarity],
+        })
+    return sections
+
+
+def should_collapse(section, bucket):
+    """Whether a reader in profile `bucket` can skim `section` from its summary."""
+    if section["page"] == 1:
+        return False
+    if _BACK_MATTER.match(section["title"]):
+        return True
+    experience, known = bucket
+    threshold = COLLAPSE_AT[experience]
+    if threshold is None or not known or not section["sentences"]:
+        return False
+    return max(section["familiarity"][TOPICS.index(t)] for t in known) >= threshold
+
+
+def hidden_pages(sections):
+    """Pages lying wholly inside the given sections."""
+    hidden = set()
+    for section in sections:
+        last = section["next_page"] - 1 if section["next_page"] is not None else section["end_page"]
+        hidden.update(range(section["page"] + 1, last + 1))
+    return hidden
+
+
+class SectionIndex:
+    """Per-paper sections, computed once and shared by all sessions."""
+
+    def __init__(self, max_papers=MAX_PAPERS):
+        self.max_papers = max_papers
+        self._sections = OrderedDict()  # digest -> sections
+        self._collapsed = OrderedDict()  # (digest, bucket) -> collapsed sections
+        self._lock = threading.Lock()
+
+    def sections(self, paper):
+        """Sections of a fully parsed `paper`, from memory, disk or a fresh split."""
+        with self._lock:
+            sections = self._sections.get(paper.digest)
+            if sections is not None:
+                self._sections.move_to_end(paper.digest)
+                return sections
+        path = data_path("sections", f"{paper.digest}.json")
+        sections = None
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("version") == FORMAT_VERSION:
+                sections = saved["sections"]
+        if sections is None:
+            sections = split_sections(paper, get_highlighter().paper_scores(paper))
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": FORMAT_VERSION, "sections": sections}, f, ensure_ascii=False)
+            os.replace(f"{path}.tmp", path)
+        with self._lock:
+            self._sections[paper.digest] = sections
+            while len(self._sections) > self.max_papers:
+                self._sections.popitem(last=False)
+        return sections
+
+    def collapsed(self, paper, profile):
+        """The sections of `paper` to collapse for a reader with `profile`."""
+        bucket = profile_bucket(profile)
+        key = (paper.digest, bucket)
+        with self._lock:
+            collapsed = self._collapsed.get(key)
+            if collapsed is not None:
+                return collapsed
+        collapsed = [s for s in self.sections(paper) if should_collapse(s, bucket)]
+        with self._lock:
+            self._collapsed[key] = collapsed
+            while len(self._collapsed) > self.max_papers * 8:
+                self._collapsed.popitem(last=False)
+        return collapsed
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_section_index():
+    """Return the process-wide SectionIndex."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SectionIndex()
+    return _index
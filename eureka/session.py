@@ -0,0 +1,119 @@
+"""Saving and restoring a reader's session state across reconnects.
+
+On their first visit a reader is given an internal user id and an unguessable session
+token, which is added to the URL as the `session` query parameter. Only a hash of the
+token is stored, and only tokens this server issued are accepted, so reloading or
+reopening the same link restores the reader's profile, chat, knowledge model and the paper
+they had open, from one lookup of the token and snapshot, while a made-up or stale link
+starts a fresh session. Activity is read from the store when a page first needs it. Neither the user id nor the token is
+ever sent to other services: what a reader shares with a group is signed with a separate
+random `author_id`. Snapshots are written behind the page, and only when something
+persistent has changed; activity events are appended to the store as they happen.
+"""
+import hashlib
+import secrets
+import uuid
+
+from eureka import metrics
+from eureka.store import get_store
+
+TOKEN_PARAM = "session"
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def restore_session(state, query_params):
+    """Attach this session to a user through its session token and, once per session, restore their saved state."""
+    metrics.start_rerun(state)
+    if "uid" not in state:
+        store = get_store()
+        token = query_params.get(TOKEN_PARAM)
+        found = store.load_session(_token_hash(token)) if token else None
+        if found is None:
+            uid, token = uuid.uuid4().hex, secrets.token_urlsafe(32)
+            store.save_token(_token_hash(token), uid)
+            found = uid, None
+        state["uid"], state["session_token"] = found[0], token
+        _restore(state, found[1])
+    # Page switches drop query parameters, so put the token back on every page.
+    if query_params.get(TOKEN_PARAM) != state["session_token"]:
+        query_params[TOKEN_PARAM] = state["session_token"]
+    if "uid" in query_params:
+        del query_params["uid"]  # links from before session tokens
+    return state["uid"]
+
+
+def _restore(state, saved):
+    if saved:
+        # Imported here so pages that never touch the models don't load numpy for them.
+        from eureka.knowledge import KnowledgeModel
+
+        if saved.get("user_profile"):
+            state["user_profile"] = saved["user_profile"]
+            state["has_visited_home"] = True
+        if saved.get("chat_id"):
+            state["chat_id"] = saved["chat_id"]
+        if saved.get("groups"):
+            state["groups"] = saved["groups"]
+        if saved.get("notes"):
+            state["notes"] = saved["notes"]
+        if saved.get("knowledge"):
+            state["knowledge"] = KnowledgeModel.from_state(saved["knowledge"])
+        if saved.get("paper_digest"):
+            # Read Paper reopens it from the spooled PDF; its marks are loaded with it
+            state["paper_digest"] = saved["paper_digest"]
+            state["paper_name"] = saved.get("paper_name")
+    state["author_id"] = (saved or {}).get("author_id") or uuid.uuid4().hex
+    state["_saved_versions"] = _versions(state)
+
+
+def _versions(state):
+    knowledge = state.get("knowledge")
+    return (
+        state.get("author_id"),
+        repr(state.get("user_profile")),
+        state.get("chat_id"),
+        state.get("paper_digest"),
+        tuple(state.get("groups", ())),
+        sum(len(notes) for notes in state.get("notes", {}).values()),
+        knowledge.version if knowledge is not None else None,
+    )
+
+
+def save_session(state):
+    """Queue a snapshot of the session's persistent state if it changed since the last save."""
+    with metrics.span("session.save"):
+        _queue_snapshot(state)
+        _queue_events(state)
+    metrics.finish_rerun(state)
+
+
+def _queue_snapshot(state):
+    if "uid" not in state:
+        return
+    versions = _versions(state)
+    if versions == state.get("_saved_versions"):
+        return
+    knowledge = state.get("knowledge")
+    get_store().save_state(state["uid"], {
+        "author_id": state.get("author_id"),
+        "user_profile": state.get("user_profile"),
+        "chat_id": state.get("chat_id"),
+        "paper_digest": state.get("paper_digest"),
+        "paper_name": state.get("paper_name"),
+        "groups": state.get("groups", []),
+        "notes": state.get("notes", {}),
+        "knowledge": knowledge.to_state() if knowledge is not None else None,
+    })
+    state["_saved_versions"] = versions
+
+
+def _queue_events(state):
+    analytics = state.get("analytics")
+    saved = state.get("_saved_events", 0)
+    if "uid" not in state or analytics is None or len(analytics) == saved:
+        return
+    get_store().add_events(state["uid"], analytics.rows(saved))
+    state["_saved_events"] = len(analytics)
@@ -0,0 +1,143 @@
+"""Page-range slices of large PDFs, so the viewer only receives the pages being read.
+
+`pdf_viewer` base64-encodes whatever it is given on every rerun, so a 100 MB paper costs
+100 MB per session per rerun. Above EUREKA_PAGED_PDF_MB the page instead hands the viewer a
+small PDF holding one window of WINDOW pages, cut from the memory-mapped original with
+pymupdf. Windows are aligned to multiples of WINDOW, so every session reading the same
+pages shares one slice from a process-wide, byte-bounded LRU, and the windows on either
+side of the one being read are cut in the background so paging through is immediate.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from eureka import metrics
+
+WINDOW = int(os.environ.get("EUREKA_PDF_WINDOW", 5))
+PREFETCH = 1  # windows cut ahead of and behind the current one
+PAGED_MIN_BYTES = int(float(os.environ.get("EUREKA_PAGED_PDF_MB", 8)) * 1024 * 1024)
+DEFAULT_MAX_BYTES = int(float(os.environ.get("EUREKA_SLICE_CACHE_MB", 64)) * 1024 * 1024)
+
+
+def is_paged(asset):
+    """Whether `asset` (a PdfAsset) is large enough to be delivered a window at a time."""
+    return asset.size >= PAGED_MIN_BYTES
+
+
+def window_bounds(page, page_count, window=WINDOW):
+    """First and last page (1-based, inclusive) of the aligned window holding `page`."""
+    first = (page - 1) // window * window + 1
+    return first, min(first + window - 1, page_count)
+
+
+def window_annotations(store, first, last):
+    """Records of the AnnotationStore `store` on pages first..last, renumbered from 1 for the slice."""
+    return [dict(store.record(i), page=page - first + 1)
+            for page in range(first, last + 1) for i in store.on_page(page)]
+
+
+class SliceCache:
+    """Size-bounded LRU of PDF page-range slices, keyed by (digest, first, last)."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, workers=1):
+        self.max_bytes = max_bytes
+        self._slices = OrderedDict()
+        self._page_counts = {}
+        self._pending = {}  # key -> Future of a slice being cut
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-slice")
+        self.hits = 0
+        self.misses = 0
+
+    def page_count(self, asset):
+        count = self._page_counts.get(asset.digest)
+        if count is None:
+            import pymupdf
+
+            with pymupdf.open(stream=asset.view, filetype="pdf") as doc:
+                count = self._page_counts[asset.digest] = doc.page_count
+        return count
+
+    def window(self, asset, page, window=WINDOW):
+        """(first, last, pdf bytes) of the window holding `page`; neighbouring windows are prefetched."""
+        count = self.page_count(asset)
+        first, last = window_bounds(min(max(page, 1), count), count, window)
+        data = self.slice(asset, first, last)
+        for step in range(1, PREFETCH + 1):
+            for start in (first + step * window, first - step * window):
+                if 1 <= start <= count:
+                    self._submit(asset, *window_bounds(start, count, window))
+        return first, last, data
+
+    def slice(self, asset, first, last):
+        """PDF bytes holding pages first..last (1-based, inclusive) of `asset`."""
+        key = (asset.digest, first, last)
+        with self._lock:
+            data = self._slices.get(key)
+            if data is not None:
+                self._slices.move_to_end(key)
+                self.hits += 1
+                metrics.count("slices.hit")
+                return data
+        return self._submit(asset, first, last).result()
+
+    def _submit(self, asset, first, last):
+        key = (asset.digest, first, last)
+        with self._lock:
+            data = self._slices.get(key)
+            if data is not None:
+                return _done(data)
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self._pool.submit(self._cut, asset, first, last)
+        return future
+
+    def _cut(self, asset, first, last):
+        import pymupdf
+
+        key = (asset.digest, first, last)
+        try:
+            with metrics.span("slices.cut"), pymupdf.open(stream=asset.view, filetype="pdf") as src, pymupdf.open() as out:
+                out.insert_pdf(src, from_page=first - 1, to_page=last - 1)
+                data = out.tobytes(garbage=1, deflate=True)
+        except BaseException:
+            with self._lock:
+                self._pending.pop(key, None)
+            raise
+        with self._lock:
+            self._pending.pop(key, None)
+            self.misses += 1
+            self._slices[key] = data
+            self._bytes += len(data)
+            # Keep at least the newest slice even if it alone exceeds the budget.
+            while self._bytes > self.max_bytes and len(self._slices) > 1:
+                _, old = self._slices.popitem(last=False)
+                self._bytes -= len(old)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {"slices": len(self._slices), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "pending": len(self._pending)}
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_slice_cache():
+    """Return the process-wide SliceCache, sized by EUREKA_SLICE_CACHE_MB if set."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SliceCache()
+    return _cache
@@ -0,0 +1,232 @@
+"""Local persistence for session tokens, profiles, session snapshots, activity, reading progress and read marks.
+
+Everything lives in one SQLite database in WAL mode, so readers never block the writer.
+Reads borrow a connection from a small shared pool. Writes are queued and applied by a
+background thread in batched transactions, so page reruns never wait on disk. Repeated
+snapshots of the same user within a batch are coalesced into one. A returning user's
+session token and snapshot are read in one primary-key lookup. Their activity events are
+appended to their own table rather than rewritten with every snapshot, and are read only
+when a page needs them.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from eureka.paths import data_path
+
+POOL_SIZE = 4
+BATCH_INTERVAL = 0.2
+BATCH_SIZE = 500
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    uid TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS session_tokens (
+    token_hash TEXT PRIMARY KEY,
+    uid TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    uid TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    topic INTEGER NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_uid ON events (uid, time);
+CREATE TABLE IF NOT EXISTS reading_progress (
+    uid TEXT NOT NULL,
+    paper TEXT NOT NULL,
+    mode TEXT,
+    page INTEGER,
+    updated REAL NOT NULL,
+    PRIMARY KEY (uid, paper)
+);
+CREATE TABLE IF NOT EXISTS read_state (
+    uid TEXT NOT NULL,
+    paper TEXT NOT NULL,
+    seen BLOB NOT NULL,
+    understood BLOB NOT NULL,
+    revisit BLOB NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (uid, paper)
+);
+"""
+
+
+class Store:
+    """SQLite-backed store with pooled reads and write-behind batching."""
+
+    def __init__(self, path=None, pool_size=POOL_SIZE, batch_interval=BATCH_INTERVAL):
+        self.path = path or data_path("eureka.sqlite")
+        self.batch_interval = batch_interval
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        self._writes = queue.Queue()
+        self._pending = 0
+        self._flushed = threading.Condition()
+        self._writer = threading.Thread(target=self._write_loop, name="eureka-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for reading."""
+        db = self._pool.get()
+        try:
+            yield db
+        finally:
+            self._pool.put(db)
+
+    # Reads
+
+    def load_session(self, token_hash):
+        """(user id, saved snapshot or None) of the session token with hash `token_hash`, or None if it was never issued."""
+        with self.connection() as db:
+            row = db.execute(
+                "SELECT t.uid, s.state FROM session_tokens t LEFT JOIN sessions s ON s.uid = t.uid WHERE t.token_hash = ?",
+                (token_hash,),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def events(self, uid):
+        """(time, kind, topic, value) activity events of `uid`, oldest first."""
+        with self.connection() as db:
+            return db.execute("SELECT time, kind, topic, value FROM events WHERE uid = ? ORDER BY time", (uid,)).fetchall()
+
+    def papers(self, uid):
+        """Digests of the papers `uid` has read, most recent first."""
+        with self.connection() as db:
+            return [row[0] for row in db.execute(
+                "SELECT paper FROM reading_progress WHERE uid = ? ORDER BY updated DESC", (uid,)
+            )]
+
+    def read_state(self, uid, paper):
+        """Return the saved seen/understood/revisit bitmaps of `uid` on `paper`, or None."""
+        with self.connection() as db:
+            row = db.execute(
+                "SELECT seen, understood, revisit FROM read_state WHERE uid = ? AND paper = ?", (uid, paper)
+            ).fetchone()
+        return dict(zip(("seen", "understood", "revisit"), row)) if row else None
+
+    # Write-behind
+
+    def save_state(self, uid, state):
+        self._enqueue(("state", uid, json.dumps(state), time.time()))
+
+    def save_token(self, token_hash, uid):
+        self._enqueue(("token", token_hash, uid, time.time()))
+
+    def add_events(self, uid, events):
+        """Append (time, kind, topic, value) activity events of `uid`."""
+        self._enqueue(("events", uid, events))
+
+    def record_reading(self, uid, paper, mode=None, page=None):
+        self._enqueue(("reading", uid, paper, mode, page, time.time()))
+
+    def save_read_state(self, uid, paper, bitmaps):
+        self._enqueue(("marks", uid, paper, bitmaps["seen"], bitmaps["understood"], bitmaps["revisit"], time.time()))
+
+    def _enqueue(self, write):
+        with self._flushed:
+            self._pending += 1
+        self._writes.put(write)
+
+    def flush(self, timeout=None):
+        """Block until all queued writes are on disk."""
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._pending == 0, timeout)
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            batch = [self._writes.get()]
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._writes.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._apply(db, batch)
+            except sqlite3.Error:
+                log.exception("dropped %d writes", len(batch))
+            with self._flushed:
+                self._pending -= len(batch)
+                self._flushed.notify_all()
+
+    @staticmethod
+    def _apply(db, batch):
+        states, marks = {}, {}
+        tokens, events, readings = [], [], []
+        for kind, *args in batch:
+            if kind == "state":
+                states[args[0]] = args  # only the latest snapshot per user is written
+            elif kind == "marks":
+                marks[args[0], args[1]] = args  # and the latest marks per user and paper
+            elif kind == "token":
+                tokens.append(args)
+            elif kind == "events":
+                uid, rows = args
+                events.extend((uid, *row) for row in rows)
+            else:
+                readings.append(args)
+        db.execute("BEGIN")
+        try:
+            db.executemany(
+                "INSERT INTO sessions (uid, state, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (uid) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+                states.values(),
+            )
+            db.executemany("INSERT OR IGNORE INTO session_tokens (token_hash, uid, created) VALUES (?, ?, ?)", tokens)
+            db.executemany("INSERT INTO events (uid, time, kind, topic, value) VALUES (?, ?, ?, ?, ?)", events)
+            db.executemany(
+                "INSERT INTO reading_progress (uid, paper, mode, page, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (uid, paper) DO UPDATE SET mode = excluded.mode, "
+                "page = COALESCE(excluded.page, page), updated = excluded.updated",
+                readings,
+            )
+            db.executemany(
+                "INSERT INTO read_state (uid, paper, seen, understood, revisit, updated) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (uid, paper) DO UPDATE SET seen = excluded.seen, understood = excluded.understood, "
+                "revisit = excluded.revisit, updated = excluded.updated",
+                marks.values(),
+            )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide Store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = Store(os.environ.get("EUREKA_DB"))
+    return _store
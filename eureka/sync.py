@@ -0,0 +1,376 @@
+"""Annotation sharing for reading groups, as deltas through a sync server.
+
+Each (group, paper) pair is a room holding one `GroupDoc`: a last-writer-wins map from
+annotation id to its latest operation. An operation carries the annotation (or None once
+it is removed), the author and a Lamport clock, and replicas keep whichever operation has
+the larger (clock, author), so they converge in any order, and applying an operation
+twice does nothing.
+
+Readers only ever send what changed: `SyncClient.share` diffs a reader's highlights or
+notes against the room's replica and queues operations for new, changed or removed
+entries. A replica is diffed only once it has been pulled from the server, so a room
+that was just opened, or dropped while idle and opened again, never loses removals or
+issues clocks older than the server's. Queued operations are coalesced per annotation id and pushed in one batch per
+room every FLUSH_INTERVAL seconds, and the rooms being viewed are pulled every
+POLL_INTERVAL seconds from a per-room cursor. One client serves every session of the
+process, so a group of readers on one server shares one replica and one poll per room.
+
+By default an in-process stand-in sync server is started on a free local port and called
+over HTTP. Set EUREKA_SYNC_URL to point at another server speaking the same protocol, for
+example one started with `python -m eureka.sync --port 8766`.
+"""
+import argparse
+import asyncio
+import bisect
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from eureka import metrics
+from eureka.assets import FrozenDict
+
+FLUSH_INTERVAL = float(os.environ.get("EUREKA_SYNC_FLUSH", 0.25))
+POLL_INTERVAL = float(os.environ.get("EUREKA_SYNC_POLL", 2))
+IDLE_ROOM_SECONDS = 300  # rooms nobody has looked at for this long are dropped until opened again
+FIRST_PULL_TIMEOUT = 10  # how long share() waits for a newly opened room to be pulled
+SHARED_COLOR = "rgba(148, 0, 211, 1)"
+SHARED_BORDER = "dotted"
+_RECT = ("page", "x", "y", "width", "height")
+
+log = logging.getLogger(__name__)
+
+
+class SyncError(RuntimeError):
+    pass
+
+
+def room_name(group, digest):
+    return f"{group}\n{digest}"
+
+
+def annotation_id(author, kind, value):
+    """Stable id of an annotation, so sharing the same highlight again changes nothing."""
+    if kind == "highlight":
+        return f"{author}:h:" + ":".join(str(round(value[k], 1)) for k in _RECT)
+    return f"{author}:n:{value['created']}"
+
+
+def _newer(op, current):
+    return current is None or (op["clock"], op["author"]) > (current["clock"], current["author"])
+
+
+class GroupDoc:
+    """Replica of one room: the winning operation per annotation id."""
+
+    def __init__(self):
+        self.entries = {}
+        self.version = 0  # bumped once per entry that changes
+        self.clock = 0
+        self._views = {}  # key -> (version, records)
+        self._lock = threading.RLock()
+
+    def apply(self, ops):
+        """Merge operations in; returns the ones that changed the replica."""
+        changed = []
+        with self._lock:
+            for op in ops:
+                self.clock = max(self.clock, op["clock"])
+                if _newer(op, self.entries.get(op["id"])):
+                    self.entries[op["id"]] = op
+                    changed.append(op)
+            self.version += len(changed)
+        return changed
+
+    def diff(self, author, kind, values):
+        """Operations turning `author`'s `kind` entries into `values`: additions, changes and removals."""
+        with self._lock:
+            wanted = {annotation_id(author, kind, v): v for v in values}
+            prefix = f"{author}:{kind[0]}:"
+            ops = []
+            for id_, value in wanted.items():
+                current = self.entries.get(id_)
+                if current is None or current["value"] != value:
+                    ops.append((id_, value))
+            for id_, current in self.entries.items():
+                if id_.startswith(prefix) and id_ not in wanted and current["value"] is not None:
+                    ops.append((id_, None))
+            self.clock += 1
+            return [{"id": id_, "author": author, "kind": kind, "clock": self.clock, "value": value}
+                    for id_, value in ops]
+
+    def view(self, kind, exclude=None):
+        """Live `kind` entries as (author, value) pairs, optionally leaving out one author."""
+        return self._cached(("view", kind, exclude), lambda: tuple(
+            (op["author"], FrozenDict(op["value"])) for op in self.entries.values()
+            if op["kind"] == kind and op["value"] is not None and op["author"] != exclude))
+
+    def layer(self, exclude=None):
+        """Highlights of every author but `exclude` as annotation records in the shared style."""
+        return self._cached(("layer", exclude), lambda: tuple(
+            FrozenDict(value, color=SHARED_COLOR, border=SHARED_BORDER) for _, value in self.view("highlight", exclude)))
+
+    def _cached(self, key, build):
+        # Rebuilt only after the replica changes, so rerunning pages don't copy every annotation
+        with self._lock:
+            cached = self._views.get(key)
+            if cached is None or cached[0] != self.version:
+                cached = self._views[key] = (self.version, build())
+            return cached[1]
+
+
+class Room:
+    """Server side of a room: the replica plus a sequence-numbered log for cursors."""
+
+    def __init__(self):
+        self.doc = GroupDoc()
+        self.seq = 0
+        self.log = []  # (seq, id) in push order; an id's older entries are dropped on compaction
+        self.latest = {}  # id -> seq of its winning operation
+
+    def push(self, ops):
+        for op in self.doc.apply(ops):
+            self.seq += 1
+            self.log.append((self.seq, op["id"]))
+            self.latest[op["id"]] = self.seq
+        if len(self.log) > 2 * len(self.latest) + 64:
+            self.log = [(seq, id_) for seq, id_ in self.log if self.latest[id_] == seq]
+        return self.seq
+
+    def pull(self, since):
+        start = bisect.bisect_right(self.log, (since, "\uffff"))
+        ops = [self.doc.entries[id_] for seq, id_ in self.log[start:] if self.latest[id_] == seq]
+        return self.seq, ops
+
+
+class StandinSyncServer:
+    """Local HTTP stand-in for the sync service, keeping rooms in memory.
+
+    `POST /push {"room", "ops"}` answers `{"seq"}`; `POST /pull {"room", "since"}` answers
+    `{"seq", "ops"}` with the winning operations pushed after `since`.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.rooms = {}
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    def answer(self, path, request):
+        room = self.rooms.setdefault(request["room"], Room())
+        if path.endswith("/push"):
+            return {"seq": room.push(request["ops"])}
+        if path.endswith("/pull"):
+            seq, ops = room.pull(request["since"])
+            return {"seq": seq, "ops": ops}
+        raise KeyError(path)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                request = json.loads(await reader.readexactly(length))
+                try:
+                    status, body = "200 OK", json.dumps(self.answer(request_line.split()[1].decode(), request)).encode()
+                except KeyError:
+                    status, body = "404 Not Found", b"{}"
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class HttpTransport:
+    """Keep-alive JSON client of a sync server; used from the sync thread only."""
+
+    def __init__(self, url, timeout=10):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._conn = None
+
+    def call(self, endpoint, payload):
+        body = json.dumps(payload).encode()
+        for attempt in (0, 1):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request("POST", f"{self.path}/{endpoint}", body, {"Content-Type": "application/json"})
+                response = self._conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+                continue
+            if response.status != 200:
+                raise SyncError(f"sync server answered {response.status} to {endpoint}")
+            return json.loads(data)
+
+
+class SyncClient:
+    """Process-wide replicas of the rooms in use, kept in sync in the background."""
+
+    def __init__(self, transport, flush_interval=FLUSH_INTERVAL, poll_interval=POLL_INTERVAL):
+        self.transport = transport
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self._docs = {}  # room -> GroupDoc
+        self._cursors = {}  # room -> last server sequence pulled
+        self._viewed = {}  # room -> when a page last asked for it
+        self._outbox = {}  # room -> {id: op}, latest operation per annotation
+        self._fresh = set()  # rooms not pulled yet
+        self._pulled = {}  # room -> Event set once the replica has caught up with the server
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.pushed = 0
+        self.pulled = 0
+        threading.Thread(target=self._sync_loop, name="eureka-sync", daemon=True).start()
+
+    def doc(self, room):
+        """The replica of `room`, which is pulled from now on while it is being viewed."""
+        with self._lock:
+            doc = self._docs.get(room)
+            if doc is None:
+                doc = self._docs[room] = GroupDoc()
+                self._cursors[room] = 0
+                self._pulled[room] = threading.Event()
+                self._fresh.add(room)
+                self._wake.set()
+            self._viewed[room] = time.monotonic()
+        return doc
+
+    def share(self, room, author, kind, values):
+        """Make `author`'s `kind` entries in `room` equal `values`; returns how many changed.
+
+        Raises SyncError if a room opened just now can't be pulled from the server in time.
+        """
+        doc = self.doc(room)
+        with self._lock:
+            pulled = self._pulled[room]
+        # Diffing an empty replica would miss removals and reuse clocks the server has seen
+        if not pulled.wait(FIRST_PULL_TIMEOUT):
+            raise SyncError(f"couldn't pull {room!r} from the sync server")
+        ops = doc.diff(author, kind, values)
+        if not ops:
+            return 0
+        # Applied locally first, so the reader sees their change before the server echoes it
+        doc.apply(ops)
+        with self._lock:
+            outbox = self._outbox.setdefault(room, {})
+            for op in ops:
+                outbox[op["id"]] = op
+        metrics.count("sync.ops_queued", len(ops))
+        return len(ops)
+
+    def flush(self):
+        """Push every queued operation, one batch per room."""
+        with self._lock:
+            batches, self._outbox = self._outbox, {}
+        for room, ops in batches.items():
+            try:
+                with metrics.span("sync.push"):
+                    self.transport.call("push", {"room": room, "ops": list(ops.values())})
+                self.pushed += len(ops)
+            except (OSError, SyncError, http.client.HTTPException):
+                # Requeued under anything newer queued meanwhile
+                with self._lock:
+                    outbox = self._outbox.setdefault(room, {})
+                    for id_, op in ops.items():
+                        outbox.setdefault(id_, op)
+
+    def poll(self):
+        """Pull what changed since the last pull, for every room viewed recently."""
+        now = time.monotonic()
+        with self._lock:
+            for room, seen in list(self._viewed.items()):
+                if now - seen > IDLE_ROOM_SECONDS:
+                    del self._viewed[room], self._docs[room], self._cursors[room], self._pulled[room]
+            rooms = {room: (self._docs[room], since) for room, since in self._cursors.items()}
+            self._fresh.clear()
+        for room, (doc, since) in rooms.items():
+            try:
+                with metrics.span("sync.pull"):
+                    answer = self.transport.call("pull", {"room": room, "since": since})
+            except (OSError, SyncError, http.client.HTTPException):
+                continue
+            with self._lock:
+                if self._docs.get(room) is not doc:
+                    continue  # dropped, and maybe opened again, while pulling
+                self._cursors[room] = answer["seq"]
+                pulled = self._pulled[room]
+            self.pulled += len(doc.apply(answer["ops"]))
+            pulled.set()
+
+    def _sync_loop(self):
+        next_poll = 0.0
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if self._fresh or time.monotonic() >= next_poll:
+                self.poll()
+                next_poll = time.monotonic() + self.poll_interval
+
+
+_loop = None
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sync():
+    """Return the process-wide SyncClient, starting the stand-in sync server if needed."""
+    global _loop, _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                url = os.environ.get("EUREKA_SYNC_URL")
+                if not url:
+                    _loop = asyncio.new_event_loop()
+                    threading.Thread(target=_loop.run_forever, name="eureka-sync-server", daemon=True).start()
+                    url = asyncio.run_coroutine_threadsafe(StandinSyncServer().start(), _loop).result().url
+                _client = SyncClient(HttpTransport(url))
+    return _client
+
+
+async def _serve(host, port):
+    server = await StandinSyncServer(host, port).start()
+    log.info("Stand-in sync server listening on %s", server.url)
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stand-in annotation sync server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    asyncio.run(_serve(args.host, args.port))
@@ -0,0 +1,23 @@
+"""Text normalisation shared by the indexes."""
+import re
+
+_WORD = re.compile(r"[a-z0-9]+(?:['’-][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a about above after again against all also an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers him his how i if in into is it its itself just me more most my no nor not of
+off on once only or other our ours out over own same she should so some such than that the their
+them then there these they this those through to too under until up very was we were what when
+where which while who whom why will with would you your
+""".split())
+
+
+def tokenize(text):
+    """Lower-cased word tokens of `text`, keeping stopwords."""
+    return _WORD.findall(text.lower())
+
+
+def terms(text):
+    """Tokens of `text` without stopwords, for bag-of-words indexes."""
+    return [t for t in tokenize(text) if t not in STOPWORDS and len(t) > 1]
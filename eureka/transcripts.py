@@ -0,0 +1,56 @@
+"""Append-only, on-disk chat transcripts.
+
+Each chat is a JSON-lines file under the data directory. Only the byte offset of every
+line is held in memory, so any window of older turns can be read back on demand while
+the session itself keeps just the most recent messages.
+"""
+import json
+import os
+import threading
+import uuid
+from array import array
+
+from eureka.paths import data_path
+
+
+class Transcript:
+    """A chat transcript stored as one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = array("q")
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                offset = 0
+                for line in f:
+                    self._offsets.append(offset)
+                    offset += len(line)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def append(self, role, content):
+        line = json.dumps({"role": role, "content": content}, ensure_ascii=False).encode() + b"\n"
+        with self._lock:
+            with open(self.path, "ab") as f:
+                self._offsets.append(f.tell())
+                f.write(line)
+
+    def read(self, start, stop):
+        """Return messages `start` to `stop` (exclusive) as dicts."""
+        start, stop = max(start, 0), min(stop, len(self))
+        if start >= stop:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[start])
+            return [json.loads(f.readline()) for _ in range(stop - start)]
+
+    def tail(self, n):
+        return self.read(len(self) - n, len(self))
+
+
+def open_transcript(chat_id=None):
+    """Open the transcript for `chat_id`, or start a new chat; return (chat_id, Transcript)."""
+    chat_id = chat_id or uuid.uuid4().hex
+    return chat_id, Transcript(data_path("transcripts", f"{chat_id}.jsonl"))
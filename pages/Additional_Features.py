@@ -1,11 +1,204 @@
 import streamlit as st
-import time
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-from datetime import datetime, timedelta
+from eureka.debug import metrics_panel, resume_session, track_memory
+from eureka.session import restore_session, save_session
+
+def show_paper(i, paper, key):
+    """Show a recommended paper in an expander with read/save buttons"""
+    with st.expander(f"Paper {i+1}: {paper['title']} ({paper['year']})"):
+        st.write(f"**Authors**: {paper['authors']}")
+        st.write(f"**Abstract**: {paper['abstract']}")
+        st.write(f"**Topics**: {', '.join(paper['topics'])}")
+        st.write(f"**Citations**: {paper['citations']} | **Reading time**: {paper['reading_minutes']} minutes")
+        
+        col1, col2 = st.columns([1,1])
+        with col1:
+            if st.button(f"Read Now", key=f"read_now_{key}_{i}"):
+                st.switch_page("pages/📄Read_Paper.py")
+        with col2:
+            st.button(f"Save for Later", key=f"save_{key}_{i}")
+
+def recommendations_tab():
+    """Paper recommendations from the local corpus index"""
+    from eureka.knowledge import session_knowledge
+    from eureka.recommend import get_recommender
+
+    st.header("📚 Paper Recommendations")
+
+    st.subheader("Recommendations based on your Knowledge Map")
+    # Suggest papers on the topics the reader knows least about
+    weakest = session_knowledge(st.session_state).weakest(2)
+    profile = st.session_state.get("user_profile", {})
+    for i, paper in enumerate(get_recommender().recommend(" ".join(weakest), topics=weakest, level=profile.get("experience"), k=3)):
+        show_paper(i, paper, key="map")
+
+    st.subheader("Generate Specific Recommendations")
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        interests = st.multiselect(
+            "Filter by topics",
+            ["AI & Labor", "Human-AI Interaction", "Data & Data Economy", 
+             "AI in Business/Management", "AI & Decision-Making", "AI in Healthcare"]
+        )
+
+        difficulty = st.select_slider(
+            "Knowledge level",
+            options=["Beginner", "Intermediate", "Advanced", "Expert"],
+            value="Intermediate"
+        )
+
+    with col2:
+        st.write("Sort by:")
+        sort_option = st.radio(
+            "",
+            ["Relevance", "Publication Date", "Citation Count", "Reading Time"]
+        )
+    if st.button("Generate Recommendations"):
+        query = " ".join(interests) + " " + profile.get("goals", "")
+        papers = get_recommender().recommend(query, topics=interests, level=difficulty, sort=sort_option)
+        if not papers:
+            st.info("No papers match these filters yet. Try other topics or another knowledge level.")
+        for i, paper in enumerate(papers):
+            show_paper(i, paper, key="generated")
+
+def analytics_tab():
+    """Charts and metrics of the reader's activity"""
+    from eureka.analytics import session_analytics
+    from eureka.knowledge import render_topic_coverage, session_knowledge
+
+    st.header("📊 Knowledge Analytics")
+    st.write("Visualize your learning progress and knowledge acquisition over time.")
+
+    # Activity is aggregated as it happens; charts are only redrawn after new activity
+    log = session_analytics(st.session_state)
+    summary = log.summary()
+
+    # Create tabs for different analytics views
+    analytics_tabs = st.tabs(["Reading Activity", "Knowledge Growth", "Topic Coverage"])
+
+    with analytics_tabs[0]:
+        st.subheader("Your Reading Activity")
+        if log.weekly:
+            st.image(log.reading_activity_chart())
+        else:
+            st.info("No reading activity yet. Papers you read will show up here.")
+
+        st.metric("Papers Read This Month", summary["papers_this_month"],
+                  f"{summary['papers_this_month'] - summary['papers_last_month']:+d} from last month")
+        if summary["average_reading_minutes"] is not None:
+            this_month = summary["average_reading_minutes_this_month"]
+            st.metric("Average Reading Time", f"{summary['average_reading_minutes']:.0f} minutes",
+                      f"{this_month - summary['average_reading_minutes']:+.0f} minutes this month" if this_month is not None else None)
+
+    with analytics_tabs[1]:
+        st.subheader("Knowledge Growth Over Time")
+        if summary["knowledge_score"] is not None:
+            st.image(log.knowledge_growth_chart())
+            st.metric("Overall Knowledge Score", f"{summary['knowledge_score']:.0f}/100",
+                      f"{summary['knowledge_score'] - summary['initial_knowledge_score']:+.0f} from initial assessment")
+        else:
+            st.info("Take a quiz to start tracking your knowledge growth.")
+
+    with analytics_tabs[2]:
+        st.subheader("Topic Coverage")
+        st.image(render_topic_coverage(session_knowledge(st.session_state).mastery))
+
+def join_group(name):
+    """Add a reading group to the reader's groups"""
+    groups = st.session_state.setdefault("groups", [])
+    if name not in groups:
+        groups.append(name)
+
+def marked_passages(paper):
+    """Outlines of the passages the reader marked Understood or Revisit in a paper"""
+    from eureka.readstate import REVISIT, UNDERSTOOD, get_paragraphs, session_read_state
+
+    read_state = session_read_state(st.session_state, paper)
+    numbers = sorted(set(read_state.marked(UNDERSTOOD)) | set(read_state.marked(REVISIT)))
+    return get_paragraphs(paper).records(numbers)
+
+def collaboration_tab():
+    """Reading groups and annotation sharing"""
+    from eureka.ingest import get_ingestor
+    from eureka.store import get_store
+    from eureka.sync import SyncError, get_sync, room_name
+
+    st.header("👥 Collaboration")
+    st.write("Share papers and insights with colleagues and collaborators.")
+
+    st.subheader("Create or Join a Reading Group")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        group_name = st.text_input("Group Name", placeholder="AI Business Strategy Group")
+        st.text_area("Group Description", placeholder="A group focused on discussing the latest AI strategies for business...")
+        st.selectbox("Privacy", ["Public", "Private (Invitation Only)"])
+        if st.button("Create Group", disabled=not group_name.strip()):
+            join_group(group_name.strip())
+            st.success(f"Created {group_name.strip()}")
+
+    with col2:
+        st.subheader("Join Existing Groups")
+        groups = ["AI Ethics Discussion", "Future of Work", "ML for Business"]
+        for group in groups:
+            if st.button(f"Join {group}", key=f"join_{group}", disabled=group in st.session_state.get("groups", [])):
+                join_group(group)
+
+    joined = st.session_state.get("groups", [])
+    st.caption(f"Your groups: {', '.join(joined)}" if joined else "You haven't joined a group yet.")
+
+    st.divider()
+    st.subheader("Share Your Annotations")
+
+    # Papers this server has parsed for the reader
+    ingestor = get_ingestor()
+    papers = {p.digest: p for p in map(ingestor.get, get_store().papers(st.session_state.uid)) if p is not None and p.status == "done"}
+    if not papers:
+        st.info("Open a paper in Read Paper to share your marked passages and notes on it.")
+        return
+
+    paper_to_share = papers[st.selectbox(
+        "Select a paper to share your annotations",
+        list(papers), format_func=lambda digest: papers[digest].name or digest[:12]
+    )]
+
+    share_with = st.multiselect(
+        "Share with",
+        joined
+    )
+
+    include_options = st.multiselect(
+        "Include",
+        ["My marked passages", "My notes"], default=["My marked passages", "My notes"],
+        help="Passages you marked Understood 🧠 or Revisit ❓ while reading, and the notes you posted to each group",
+    )
+
+    if st.button("Share", disabled=not (share_with and include_options)):
+        # Only annotations the group doesn't have yet, or that changed, are sent
+        sync = get_sync()
+        author = st.session_state.author_id
+        changes = 0
+        unreachable = []
+        for group in share_with:
+            room = room_name(group, paper_to_share.digest)
+            try:
+                if "My marked passages" in include_options:
+                    changes += sync.share(room, author, "highlight", marked_passages(paper_to_share))
+                if "My notes" in include_options:
+                    changes += sync.share(room, author, "note", st.session_state.get("notes", {}).get(room, []))
+            except SyncError:
+                unreachable.append(group)
+        if unreachable:
+            st.error(f"Couldn't reach {', '.join(unreachable)} just now. Please try again.")
+        elif changes:
+            st.success(f"Shared {changes} new or changed annotations with {', '.join(share_with)}!")
+        else:
+            st.success("Your groups already have all of these annotations.")
 
 def main():
+    # Restore a returning reader's profile, chat and progress
+    restore_session(st.session_state, st.query_params)
+    resume_session()
+
     # Button to return to home
     if st.button("🏡Back to Home"):
         st.switch_page("Home.py")
@@ -13,146 +206,19 @@ def main():
     st.title("🔬 Additional Features")
     st.write("PS: Please be aware that these are not our main features, but ones requested by customers🙂.")
     # Create tabs for different features
-    feature_tabs = st.tabs(["Paper Recommendations", "Knowledge Analytics", "Collaboration"])
+    feature_tabs = st.tabs(["Paper Recommendations", "Knowledge Analytics", "Collaboration"],
+                           key="feature_tab", on_change="rerun")
     
-    # Paper Recommendations tab
-    with feature_tabs[0]:
-        st.header("📚 Paper Recommendations")
-        
-        st.subheader("Recommendations based on your Knowledge Map")
-        for i in range(3):
-            with st.expander(f"Paper {i+1}: AI Business Integration Strategies {2023-i}"):
-                st.write(f"**Authors**: J. Smith, A. Johnson, et al.")
-                st.write(f"**Abstract**: This paper examines how businesses can effectively integrate AI solutions...")
-                st.write(f"**Topics**: AI in Business, Decision-Making")
-                
-                col1, col2 = st.columns([1,1])
-                with col1:
-                    if st.button(f"Read Now", key=f"read_now_{i}"):
-                        st.switch_page("pages/📄Read_Paper.py")
-                with col2:
-                    st.button(f"Save for Later", key=f"save_{i}")
-
-        st.subheader("Generate Specific Recommendations")
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            interests = st.multiselect(
-                "Filter by topics",
-                ["AI & Labor", "Human-AI Interaction", "Data & Data Economy", 
-                 "AI in Business/Management", "AI & Decision-Making", "AI in Healthcare"]
-            )
-            
-            difficulty = st.select_slider(
-                "Knowledge level",
-                options=["Beginner", "Intermediate", "Advanced", "Expert"],
-                value="Intermediate"
-            )
-        
-        with col2:
-            st.write("Sort by:")
-            sort_option = st.radio(
-                "",
-                ["Relevance", "Publication Date", "Citation Count", "Reading Time"]
-            )
-        if st.button("Generate Recommendations"):
-            with st.spinner("Finding the perfect papers for you..."):
-                time.sleep(1.5)
-                
-        # Sample recommendations
+    # Only the open tab runs, so a feature's heavy dependencies load when it is first opened
+    for tab, render in zip(feature_tabs, [recommendations_tab, analytics_tab, collaboration_tab]):
+        if tab.open:
+            with tab:
+                render()
 
-    
-    # Knowledge Analytics tab
-    with feature_tabs[1]:
-        st.header("📊 Knowledge Analytics")
-        st.write("Visualize your learning progress and knowledge acquisition over time.")
-        
-        # Sample visualization data
-        reading_dates = pd.date_range(start='1/1/2023', periods=10, freq='W')
-        papers_read = np.cumsum(np.random.randint(1, 3, size=10))
-        knowledge_score = [40 + i*5 + np.random.randint(-3, 5) for i in range(10)]
-        
-        # Create tabs for different analytics views
-        analytics_tabs = st.tabs(["Reading Activity", "Knowledge Growth", "Topic Coverage"])
-        
-        with analytics_tabs[0]:
-            st.subheader("Your Reading Activity")
-            fig, ax = plt.subplots(figsize=(10, 5))
-            ax.plot(reading_dates, papers_read, marker='o')
-            ax.set_xlabel('Date')
-            ax.set_ylabel('Cumulative Papers Read')
-            ax.grid(True, linestyle='--', alpha=0.7)
-            st.pyplot(fig)
-            
-            st.metric("Papers Read This Month", "4", "+2 from last month")
-            st.metric("Average Reading Time", "35 minutes", "-5 minutes from average")
-            
-        with analytics_tabs[1]:
-            st.subheader("Knowledge Growth Over Time")
-            fig, ax = plt.subplots(figsize=(10, 5))
-            ax.plot(reading_dates, knowledge_score, marker='o', color='green')
-            ax.set_xlabel('Date')
-            ax.set_ylabel('Knowledge Score')
-            ax.grid(True, linestyle='--', alpha=0.7)
-            st.pyplot(fig)
-            
-            st.metric("Overall Knowledge Score", "87/100", "+12 from initial assessment")
-            
-        with analytics_tabs[2]:
-            st.subheader("Topic Coverage")
-            topics = ['AI & Labor', 'Human-AI Interaction', 'Data Economy', 
-                     'Business/Management', 'Decision-Making', 'Healthcare']
-            coverage = [85, 70, 45, 90, 60, 30]
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.barh(topics, coverage, color='skyblue')
-            ax.set_xlabel('Knowledge Coverage (%)')
-            ax.set_title('Your Topic Mastery')
-            ax.grid(True, axis='x', linestyle='--', alpha=0.7)
-            st.pyplot(fig)
-    
-    # Collaboration tab
-    with feature_tabs[2]:
-        st.header("👥 Collaboration")
-        st.write("Share papers and insights with colleagues and collaborators.")
-        
-        st.subheader("Create or Join a Reading Group")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.text_input("Group Name", placeholder="AI Business Strategy Group")
-            st.text_area("Group Description", placeholder="A group focused on discussing the latest AI strategies for business...")
-            st.selectbox("Privacy", ["Public", "Private (Invitation Only)"])
-            st.button("Create Group")
-            
-        with col2:
-            st.subheader("Join Existing Groups")
-            groups = ["AI Ethics Discussion", "Future of Work", "ML for Business"]
-            for group in groups:
-                st.button(f"Join {group}", key=f"join_{group}")
-        
-        st.divider()
-        st.subheader("Share Your Annotations")
-        
-        paper_to_share = st.selectbox(
-            "Select a paper to share your annotations",
-            ["Smith et al. (2023) - AI Integration Frameworks", 
-             "Johnson (2022) - Business Models for AI", 
-             "Williams & Brown (2023) - Ethical Considerations"]
-        )
-        
-        share_with = st.multiselect(
-            "Share with",
-            ["Alice Johnson", "Bob Smith", "Charlie Brown", "AI Business Strategy Group"]
-        )
-        
-        include_options = st.multiselect(
-            "Include",
-            ["My highlights", "My notes", "Quiz results", "Knowledge map impact"]
-        )
-        
-        if st.button("Share"):
-            st.success("Successfully shared with selected recipients!")
-    
+    # Persist any changes in the background
+    save_session(st.session_state)
+    track_memory()
+    metrics_panel()
 
 if __name__ == "__main__":
     main()
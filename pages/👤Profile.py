@@ -1,6 +1,8 @@
 # display contents of the profile page
 import streamlit as st
 import time
+from eureka.debug import metrics_panel, resume_session, track_memory
+from eureka.session import restore_session, save_session
 
 @st.dialog("Welcome to Eureka💡")
 def initial_setup():    
@@ -44,6 +46,10 @@ def initial_setup():
         st.rerun()
 
 def main():
+    # Restore a returning reader's profile, chat and progress
+    restore_session(st.session_state, st.query_params)
+    resume_session()
+
     # Button to return to home
     if st.button("🏡Back to Home"):
         st.switch_page("Home.py")
@@ -69,13 +75,19 @@ def main():
             st.switch_page("pages/🧠Test_Knowledge.py")
 
         st.subheader("Your Knowledge Map")
+        from eureka.knowledge import render_knowledge_map, session_knowledge
         st.write("Visualization of your current knowledge based on papers you've read and your manual inputs of knowledge level. (Imagine this map is interactive and each node is clickable to show more details.🙂)")
-        st.image("media/images/knowledge-map.png", caption="Knowledge Map")
+        st.image(render_knowledge_map(session_knowledge(st.session_state).mastery), caption="Knowledge Map")
     else:
         st.title("👤 Profile")
         st.write("No profile information available. Please set up your profile first.")
         if st.button("Set up Profile"):
             initial_setup()
 
+    # Persist any changes in the background
+    save_session(st.session_state)
+    track_memory()
+    metrics_panel()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,24 +1,57 @@
 import streamlit as st
-from streamlit_pdf_viewer import pdf_viewer
-import time
-import json
 import os
+import time
+from eureka.assets import get_asset_cache
+from eureka import metrics
+from eureka.copilot import get_copilot
+from eureka.explain import explanation_key, get_explanation_cache
+from eureka.ingest import get_ingestor
+from eureka.debug import metrics_panel, release_upload, resume_session, track_memory
+from eureka.session import restore_session, save_session
+from eureka.slices import WINDOW, get_slice_cache, is_paged, window_annotations
+from eureka.store import get_store
+from eureka.transcripts import open_transcript
 
-def bot_response_generator(user_input):
-    """Generate streaming bot responses based on user input"""
-    if "explain" in user_input.lower():
-        response = "This is a simple explanation for the super complicated lines you selected."
-    elif "quiz" in user_input.lower() or "test" in user_input.lower():
-        response = "Click on the 'Test Knowledge' button to take quizzes on papers you've read or explore your knowledge map."
-    elif "mode" in user_input.lower() or "reading" in user_input.lower():
-        response = "We offer three reading modes: Exploratory (for new ideas), Understanding (for comprehensive learning), and Revisiting (for quick review)."
-    else:
-        response = "How can I help you with your academic paper reading experience today? You can ask about reading modes, paper uploads, or knowledge testing."
-    
-    # Stream the response word by word
-    for word in response.split():
-        yield word + " "
-        time.sleep(0.05)
+# PDF and annotation file shown for each reading mode
+MODE_ASSETS = {
+    "Exploratory": ("media/docs/toward-human-centered-algorithm-design-exploratory.pdf", "annotations/anno1.json"),
+    "Understanding": ("media/docs/toward-human-centered-algorithm-design-exploratory-understanding.pdf", "annotations/anno2.json"),
+    "Revisiting": ("media/docs/toward-human-centered-algorithm-design-exploratory-understanding.pdf", "annotations/anno3.json"),
+}
+# How many of a paper's closest topics are credited to the reader's knowledge map when it is read in Understanding mode
+CREDITED_TOPICS = 2
+# Number of recent chat messages kept in the session and rendered on each rerun
+CHAT_WINDOW = 20
+SEARCH_SCOPES = ["This paper", "All my papers"]
+
+def bot_response_generator(user_input, context=None):
+    """Stream the copilot's answer token by token as the backend produces it"""
+    return get_copilot().stream(user_input, context)
+
+def explain_selection(paper, span, text):
+    """Stream an explanation of the selected lines, replaying a cached answer for the same paper, passage and reader level"""
+    key = explanation_key(paper.digest, span, st.session_state.get("user_profile"))
+    # The page around the selection; fixed by the paper and span, so it is covered by the key
+    context = paper.pages[span[0]].text
+    return get_explanation_cache().stream(key, lambda: bot_response_generator(f"Explain these lines:\n\n{text}", context))
+
+def chat_context(selection):
+    """Paper text for a chat question: the selected lines, else page 1 of the upload as soon as it is parsed"""
+    if selection is not None:
+        return selection[2]
+    paper = get_ingestor().get(st.session_state.get("paper_digest"))
+    page = paper.pages.get(1) if paper is not None else None
+    return page.text if page is not None else None
+
+def current_selection():
+    """(paper, (page, first word, last word), text) of the paragraph last clicked in the viewer, or None"""
+    paper = current_paper()
+    selected = st.session_state.get("selected_paragraph")
+    if paper is None or not selected or selected[0] != paper.digest:
+        return None
+    from eureka.readstate import get_paragraphs
+
+    return (paper,) + get_paragraphs(paper).selection(paper, selected[1])
 
 @st.dialog("What are reading modes?")
 def show_help_reading_mode():
@@ -33,52 +66,267 @@ def show_help_reading_mode():
         - Highlights key ideas, supporting examples, contextual setup
         - Uses different colors for different importance levels
         - Shows how ideas connect to your prior knowledge
+
+        **Revisiting Mode**
+        - Highlights only the passages you marked Revisit ❓
+        - Click a highlight in any mode to mark its paragraph as seen, then mark it Understood 🧠 or Revisit ❓
     """)
 
+def ingest_upload(uploaded_file):
+    """Hand a new upload to the background ingestor and return its IngestedPaper"""
+    ingestor = get_ingestor()
+    paper = ingestor.get(st.session_state.get("paper_digest"))
+    if paper is None or st.session_state.get("paper_file_id") != uploaded_file.file_id:
+        paper = ingestor.submit(uploaded_file.getvalue(), uploaded_file.name)
+        st.session_state.paper_file_id = uploaded_file.file_id
+        st.session_state.paper_digest = paper.digest
+        st.session_state.paper_name = uploaded_file.name
+    return paper
+
+def remember_message(role, content):
+    """Append a message to the persisted transcript and keep only the recent window in the session"""
+    st.session_state.transcript.append(role, content)
+    st.session_state.messages.append({"role": role, "content": content})
+    del st.session_state.messages[:-CHAT_WINDOW]
+
+@st.fragment
+def chat_panel():
+    """Chat sidebar; reruns on its own so chatting doesn't rerun the PDF viewer"""
+    # Initialize chat history in session state if it doesn't exist (or was dropped while idle), resuming a saved chat
+    if 'transcript' not in st.session_state:
+        st.session_state.chat_id, st.session_state.transcript = open_transcript(st.session_state.get("chat_id"))
+        st.session_state.messages = st.session_state.transcript.tail(CHAT_WINDOW)
+        st.session_state.chat_earlier = 0
+
+    st.title("Chat")
+
+    selection = current_selection()
+    explain = st.button("Explain selected lines", disabled=selection is None,
+                        help="Click a highlighted passage in your paper to select its lines")
+    prompt = st.chat_input("What is up?")
+
+    # Older turns stay on disk until the reader asks for them
+    transcript = st.session_state.transcript
+    hidden = len(transcript) - len(st.session_state.messages) - st.session_state.chat_earlier
+    if hidden > 0 and st.button(f"Show earlier messages ({hidden})", key="show_earlier_messages"):
+        st.session_state.chat_earlier += min(hidden, CHAT_WINDOW)
+        hidden -= min(hidden, CHAT_WINDOW)
+    earlier = transcript.read(hidden, hidden + st.session_state.chat_earlier)
+
+    # Display chat messages from history on app rerun
+    for message in earlier + st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    if explain and selection is not None:
+        paper, span, text = selection
+        request = f"Explain selected lines (p. {span[0]})"
+        remember_message("user", request)
+        with st.chat_message("user"):
+            st.markdown(request)
+        with st.chat_message("assistant"), metrics.span("chat.explain"):
+            response = st.write_stream(explain_selection(paper, span, text))
+        remember_message("assistant", response)
+    elif prompt:
+        # Add user message to chat history
+        remember_message("user", prompt)
+        # Display user message in chat message container
+        with st.chat_message("user"):
+            st.markdown(prompt)
+
+        # Display assistant response in chat message container
+        with st.chat_message("assistant"), metrics.span("chat.stream"):
+            response = st.write_stream(bot_response_generator(prompt, chat_context(selection)))
+        # Add assistant response to chat history
+        remember_message("assistant", response)
+
+@st.fragment(run_every=1)
+def parsing_progress(paper):
+    """Parsing progress of the upload; reruns the page when more pages are ready, and is no longer drawn once all are"""
+    if paper.status not in ("queued", "parsing") or paper.ready_pages != st.session_state.get("rendered_pages"):
+        st.rerun()
+    st.caption(f"Processing your paper: {paper.ready_pages}/{paper.page_count or '?'} pages ready")
+
+def turn_pages(digest, step, page_count):
+    """Move the reader's window of a paged PDF by `step` windows"""
+    pages = st.session_state.setdefault("viewer_pages", {})
+    pages[digest] = min(max(pages.get(digest, 1) + step * WINDOW, 1), page_count)
+
+def paged_view(pdf, store):
+    """Slice of a large PDF around the reader's page, with page navigation; returns (pdf bytes, annotations, (first, last) page)"""
+    slices = get_slice_cache()
+    page_count = slices.page_count(pdf)
+    page = st.session_state.get("viewer_pages", {}).get(pdf.digest, 1)
+    first, last, data = slices.window(pdf, page)
+
+    col_prev, col_info, col_next = st.columns([0.25, 0.5, 0.25])
+    col_prev.button("◀ Previous pages", disabled=first == 1, on_click=turn_pages, args=(pdf.digest, -1, page_count))
+    col_info.caption(f"Pages {first}–{last} of {page_count}")
+    col_next.button("Next pages ▶", disabled=last == page_count, on_click=turn_pages, args=(pdf.digest, 1, page_count))
+    return data, window_annotations(store, first, last), (first, last)
+
+def expand_section(key):
+    st.session_state.setdefault("expanded_sections", set()).add(key)
+
+def collapsed_outline(paper, collapsed):
+    """One-line summaries of the sections the reader can skim; returns the ones still collapsed"""
+    expanded = st.session_state.get("expanded_sections", set())
+    collapsed = [s for s in collapsed if (paper.digest, s["page"], s["title"]) not in expanded]
+    if not collapsed:
+        return collapsed
+    with st.expander(f"Collapsed {len(collapsed)} sections you likely know", expanded=True):
+        for section in collapsed:
+            key = (paper.digest, section["page"], section["title"])
+            col_text, col_button = st.columns([0.85, 0.15])
+            col_text.markdown(f"**{section['title']}** (p. {section['page']}) — {section['summary'] or 'No summary'}")
+            col_button.button("Expand", key=f"expand_{section['page']}_{section['title']}", on_click=expand_section, args=(key,))
+    return collapsed
+
+def jump_to(digest, page):
+    """Bring `page` of the open paper into view"""
+    st.session_state.search_page = page
+    st.session_state.setdefault("viewer_pages", {})[digest] = page
+
+def search_panel(paper):
+    """Full-text search over the open paper or all the reader's papers; returns the hits in the open paper"""
+    from eureka.search import get_search_library
+
+    # Indexed once per paper content, shared by all sessions
+    library = get_search_library()
+    library.add(paper)
+
+    col_query, col_scope = st.columns([0.7, 0.3])
+    query = col_query.text_input("Search", placeholder="Words or a phrase; end a word with * to match its start", key="search_query")
+    scope = col_scope.segmented_control("Search in", SEARCH_SCOPES, default=SEARCH_SCOPES[0], key="search_scope")
+    if not query:
+        return []
+    papers = [paper.digest]
+    if scope == "All my papers":
+        papers += get_store().papers(st.session_state.uid)
+    hits = library.search(query, papers=papers)
+    with st.expander(f"{len(hits)} matches for “{query}”", expanded=bool(hits)):
+        for i, hit in enumerate(hits):
+            if hit["paper"] == paper.digest:
+                col_text, col_button = st.columns([0.85, 0.15])
+                col_text.markdown(f"p. {hit['page']} — …{hit['snippet']}…")
+                col_button.button("Go", key=f"search_hit_{i}", on_click=jump_to, args=(paper.digest, hit["page"]))
+            else:
+                st.markdown(f"*{hit['name'] or 'Untitled paper'}*, p. {hit['page']} — …{hit['snippet']}…")
+    return [hit for hit in hits if hit["paper"] == paper.digest]
+
+@st.fragment(run_every=5)
+def group_updates(room):
+    """Watch the group's annotations without rerunning the viewer; offer to show what arrived"""
+    from eureka.sync import get_sync
+
+    new = get_sync().doc(room).version - st.session_state.group_seen.get(room, 0)
+    if new > 0 and st.button(f"Show {new} new group annotations", key="show_group_updates"):
+        st.rerun()
+
+def group_panel(paper):
+    """Reading-group notes on the open paper and a note form; returns the other members' highlight rectangles"""
+    from eureka.sync import SyncError, get_sync, room_name
+
+    groups = st.session_state.get("groups")
+    if not groups:
+        return []
+    col_group, col_toggle = st.columns([0.7, 0.3])
+    group = col_group.selectbox("Reading group", groups, key="viewer_group")
+    if not col_toggle.toggle("Show group annotations", key="show_group_annotations"):
+        return []
+
+    sync = get_sync()
+    room = room_name(group, paper.digest)
+    doc = sync.doc(room)
+    notes = sorted(doc.view("note"), key=lambda note: (note[1]["page"], note[1]["created"]))
+    with st.expander(f"Group notes ({len(notes)})"):
+        for _, note in notes:
+            st.markdown(f"**{note['by']}**, p. {note['page']}: {note['text']}")
+        with st.form("group_note", clear_on_submit=True):
+            page = st.number_input("Page", min_value=1, max_value=paper.page_count, value=1)
+            text = st.text_input("Note")
+            if st.form_submit_button("Post to group") and text.strip():
+                # Kept per room, so a note posted to one group is never shared with another
+                mine = st.session_state.setdefault("notes", {}).setdefault(room, [])
+                by = (st.session_state.get("user_profile") or {}).get("name") or "A reader"
+                mine.append({"page": int(page), "text": text.strip(), "created": int(time.time() * 1000), "by": by})
+                try:
+                    sync.share(room, st.session_state.author_id, "note", mine)
+                except SyncError:
+                    st.error("Couldn't reach your reading group just now. Your note is saved and will be shared next time.")
+                else:
+                    st.rerun()
+
+    # What arrives later is announced by the fragment instead of redrawing the viewer
+    st.session_state.setdefault("group_seen", {})[room] = doc.version
+    group_updates(room)
+    return doc.layer(exclude=st.session_state.author_id)
+
+def current_paper():
+    """The session's parsed upload, or None while it is still being processed"""
+    paper = get_ingestor().get(st.session_state.get("paper_digest"))
+    return paper if paper is not None and paper.status == "done" else None
+
+def set_mark(paper, i, mark):
+    """Toggle Understood or Revisit on a paragraph; each one clears the other"""
+    from eureka.readstate import REVISIT, UNDERSTOOD, save_read_state, session_read_state
+
+    read_state = session_read_state(st.session_state, paper)
+    on = not read_state.has(mark, i)
+    read_state.mark(mark, i, on)
+    if on:
+        read_state.mark(REVISIT if mark == UNDERSTOOD else UNDERSTOOD, i, False)
+    save_read_state(st.session_state, paper)
+
+def marks_bar(paper):
+    """Read-state counts and the mark buttons for the last clicked paragraph"""
+    from eureka.readstate import MARKS, REVISIT, SEEN, UNDERSTOOD, get_paragraphs, session_read_state
+
+    read_state = session_read_state(st.session_state, paper)
+    counts = " · ".join(f"{mark.capitalize()} {read_state.count(mark)}" for mark in MARKS)
+    st.caption(f"{counts} of {read_state.paragraphs} paragraphs")
+    selected = st.session_state.get("selected_paragraph")
+    if not selected or selected[0] != paper.digest:
+        return
+    i = selected[1]
+    col_text, col_understood, col_revisit = st.columns([0.5, 0.25, 0.25])
+    col_text.markdown(f"Paragraph {i + 1} on p. {get_paragraphs(paper).pages[i]}" + (" ✅" if read_state.has(SEEN, i) else ""))
+    col_understood.button("Understood 🧠", type="primary" if read_state.has(UNDERSTOOD, i) else "secondary",
+                          on_click=set_mark, args=(paper, i, UNDERSTOOD))
+    col_revisit.button("Revisit ❓", type="primary" if read_state.has(REVISIT, i) else "secondary",
+                       on_click=set_mark, args=(paper, i, REVISIT))
+
 def my_custom_annotation_handler(annotation):
-    st.toast("Seen✅, Understood🧠, Revisit❓")
+    """Mark the clicked paragraph as seen and select it for the Understood / Revisit buttons"""
+    # The viewer reports its last click on every rerun, so each click is handled once
+    if annotation == st.session_state.get("last_annotation_click"):
+        return
+    st.session_state.last_annotation_click = annotation
+    paper = current_paper()
+    if paper is None:
+        st.toast("Seen✅, Understood🧠, Revisit❓")
+        return
+    from eureka.readstate import SEEN, get_paragraphs, save_read_state, session_read_state
+
+    # Pages of a large paper's window are numbered from the window's first page
+    page = annotation["page"] + st.session_state.get("viewer_first_page", 1) - 1
+    i = get_paragraphs(paper).locate(page, annotation["x"], annotation["y"], annotation.get("width", 0), annotation.get("height", 0))
+    if i is None:
+        return
+    if session_read_state(st.session_state, paper).mark(SEEN, i):
+        save_read_state(st.session_state, paper)
+    st.session_state.selected_paragraph = (paper.digest, i)
+    st.toast("Seen✅ Mark this paragraph Understood🧠 or Revisit❓ above the paper")
 
 
 def main():
-    # Initialize chat history in session state if it doesn't exist
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
+    # Restore a returning reader's profile, chat and progress
+    restore_session(st.session_state, st.query_params)
+    resume_session()
 
     # Sidebar chat interface
     with st.sidebar:
-        st.title("Chat")
-
-        explain = st.button("Explain selected lines")
-        prompt = st.chat_input("What is up?")
-        
-        # Display chat messages from history on app rerun
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-
-
-        if explain:
-            st.session_state.messages.append({"role": "user", "content": "Explain selected lines"})
-            with st.chat_message("user"):
-                st.markdown("Explain selected lines")
-            with st.chat_message("assistant"):
-                response = st.write_stream(bot_response_generator("Explain selected lines"))
-            st.session_state.messages.append({"role": "assistant", "content": response})
-        else:
-        # Accept user input
-            if prompt:
-                # Add user message to chat history
-                st.session_state.messages.append({"role": "user", "content": prompt})
-                # Display user message in chat message container
-                with st.chat_message("user"):
-                    st.markdown(prompt)
-
-                # Display assistant response in chat message container
-                with st.chat_message("assistant"):
-                    response = st.write_stream(bot_response_generator(prompt))
-                # Add assistant response to chat history
-                st.session_state.messages.append({"role": "assistant", "content": response})        
-
+        chat_panel()
 
     # Button to return to home
     if st.button("🏡Back to Home"):
@@ -87,16 +335,37 @@ def main():
     st.title("📄Read Paper")
     
     # File uploader
-    uploaded_file = st.file_uploader("Choose a PDF file", type="pdf")
-    
+    uploaded_file = st.file_uploader("Choose a PDF file", type="pdf", key="paper_upload")
+
+    # Parsing runs in the background; pages become usable as soon as they are parsed. Once the
+    # paper is spooled to disk the upload is released, and the paper is found by its content hash.
     if uploaded_file is not None:
-        # Save the file information to session state
-        if 'uploaded_paper' not in st.session_state:
-            st.session_state.uploaded_paper = uploaded_file
+        paper = ingest_upload(uploaded_file)
+        if paper.path is not None:
+            release_upload()
+    elif st.session_state.get("paper_digest"):
+        # The paper open before a reload or reconnect, parsed again if the server restarted since
+        paper = get_ingestor().reopen(st.session_state.paper_digest, st.session_state.get("paper_name"))
+    else:
+        paper = None
+
+    if paper is not None:
+        # The viewer and the reader models are only loaded once there is a paper to show
+        from streamlit_pdf_viewer import pdf_viewer
+        from eureka.analytics import reading_minutes, session_analytics
+        from eureka.highlights import get_highlighter
+        from eureka.sections import get_section_index, hidden_pages
+        from eureka.knowledge import session_knowledge
+
+        if paper.status == "failed":
+            st.error("We couldn't process this PDF. Please try another file.")
+        elif paper.status != "done":
+            st.session_state.rendered_pages = paper.ready_pages
+            parsing_progress(paper)
         
         col_left, col_right = st.columns([0.9, 0.1])
         with col_left:
-            options = ["Exploratory", "Understanding"]
+            options = ["Exploratory", "Understanding", "Revisiting"]
             selection = st.segmented_control(
                 "Reading Mode", options, selection_mode="single", default="Understanding"
             )
@@ -107,41 +376,118 @@ def main():
                 show_help_reading_mode()
 
         pdf_content = None
+        annotations = []
+        pages_to_render = []
+        placeholder = None  # shown instead of the viewer when none of the pages in view can be drawn
+        shown = (1, paper.page_count)
+        scroll_to_page = None
         
-        if selection == "Exploratory":
+        if selection in MODE_ASSETS:
             st.text(f"Viewing in {selection} mode")
-            # Use the exploratory-mode.pdf file instead of uploaded file
-            with open("media/docs/toward-human-centered-algorithm-design-exploratory.pdf", "rb") as f:
-                pdf_content = f.read()
-            with open("annotations/anno1.json", "r") as f:
-                annotations = json.load(f)
+            assets = get_asset_cache()
+            if paper.status == "done" and selection == "Revisiting":
+                # Only the paragraphs the reader flagged, read straight from their Revisit bitmap
+                from eureka.annotations import AnnotationStore
+                from eureka.readstate import REVISIT, get_paragraphs, session_read_state
 
-        elif selection == "Understanding":
-            st.text(f"Viewing in {selection} mode")
-            # Use the understanding-mode.pdf file instead of uploaded file
-            with open("media/docs/toward-human-centered-algorithm-design-exploratory-understanding.pdf", "rb") as f:
-                pdf_content = f.read()
-            with open("annotations/anno2.json", "r") as f:
-                annotations = json.load(f)
-            
-        # elif selection == "Revisiting":
-        #     st.text(f"Viewing in {selection} mode")
-        #     # Continue using the uploaded file for Revisiting mode
-        #     with open("media/docs/exploratory-mode.pdf", "rb") as f:
-        #         pdf_content = f.read()
-        #     with open("annotations/anno3.json", "r") as f:
-        #         annotations = json.load(f)
+                pdf = assets.pdf(paper.path)
+                flagged = session_read_state(st.session_state, paper).marked(REVISIT)
+                store = AnnotationStore.from_records(get_paragraphs(paper).records(flagged))
+                if not flagged:
+                    st.info("Nothing to revisit yet. Click a highlight in another mode and mark its paragraph Revisit ❓.")
+            elif paper.status == "done":
+                # The reader's own paper, highlighted for their profile; both modes are computed together
+                pdf = assets.pdf(paper.path)
+                store = get_highlighter().highlights(paper, selection, st.session_state.get("user_profile"))
+            elif paper.path is not None and paper.ready_pages:
+                # The upload's pages parsed so far, highlighted once the whole paper is in
+                from eureka.annotations import AnnotationStore
+
+                pdf = assets.pdf(paper.path)
+                store = AnnotationStore.from_records([])
+            else:
+                # The demo paper until the upload's first page is parsed; mode PDFs and annotations are shared by all sessions
+                pdf_path, annotations_path = MODE_ASSETS[selection]
+                pdf = assets.pdf(pdf_path)
+                store = assets.annotations(annotations_path)
+            if is_paged(pdf):
+                # Large papers reach the viewer a few pages at a time, with the next pages prepared in the background
+                pdf_content, annotations, shown = paged_view(pdf, store)
+            else:
+                pdf_content = pdf.data
+                annotations = list(store.records())
+
+            # Exploratory mode folds away sections the reader knows, from sections split once per paper
+            if selection == "Exploratory" and paper.status == "done":
+                collapsed = collapsed_outline(paper, get_section_index().collapsed(paper, st.session_state.get("user_profile")))
+                hidden = hidden_pages(collapsed)
+                if hidden:
+                    first, last = shown
+                    pages_to_render = [p - first + 1 for p in range(first, last + 1) if p not in hidden]
+                    if not pages_to_render:
+                        other_pages = ", or turn to other pages" if shown != (1, paper.page_count) else ""
+                        placeholder = f"Pages {first}–{last} are all in collapsed sections. Expand a section above to read it{other_pages}."
+            elif paper.status != "done" and paper.path is not None and paper.ready_pages:
+                first, last = shown
+                pages_to_render = [p - first + 1 for p in range(first, last + 1) if p in paper.pages]
+                if not pages_to_render:
+                    placeholder = f"Pages {first}–{last} are still being processed."
+
+            # The viewer draws every page when given none, so an empty list is never passed to it
+
+        # Search matches and the reading group's highlights are outlined on top of the reader's own
+        if paper.status == "done":
+            first, last = shown
+            overlay = [rect for hit in search_panel(paper) for rect in hit["rects"]] + list(group_panel(paper))
+            annotations += [dict(rect, page=rect["page"] - first + 1) for rect in overlay if first <= rect["page"] <= last]
+            page = st.session_state.pop("search_page", None)
+            if page is not None and first <= page <= last:
+                scroll_to_page = page - first + 1
+
+
+        # Each paper counts once per session towards reading activity, once its length is known
+        if paper.status == "done" and st.session_state.get("logged_paper") != paper.digest:
+            session_analytics(st.session_state).record_reading(reading_minutes(paper.word_count))
+            st.session_state.logged_paper = paper.digest
+        if st.session_state.get("progress_mode") != (paper.digest, selection):
+            get_store().record_reading(st.session_state.uid, paper.digest, selection)
+            st.session_state.progress_mode = (paper.digest, selection)
+
+        # Exploratory mode leaves the knowledge base untouched; the topics are the paper's own, from its full text
+        if selection == "Understanding" and paper.status == "done" and st.session_state.get("credited_paper") != paper.digest:
+            from eureka.recommend import get_recommender
+
+            session_knowledge(st.session_state).record_reading(get_recommender().topics_of(paper.text(), CREDITED_TOPICS))
+            st.session_state.credited_paper = paper.digest
+
+        # Filled in after the viewer, which reports clicks while it is drawn
+        marks_container = st.container()
+        st.session_state.viewer_first_page = shown[0]
 
         # Display the PDF viewer with the appropriate content
-        pdf_viewer(
-            pdf_content,
-            width=1200,
-            height=1000,
-            # annotations=annotations,
-            on_annotation_click=my_custom_annotation_handler,
-            render_text=True,
-        )
-        
+        if placeholder is not None:
+            st.info(placeholder)
+        else:
+            with metrics.span("page.pdf_viewer"):
+                pdf_viewer(
+                    pdf_content,
+                    width=1200,
+                    height=1000,
+                    # The demo PDFs have their highlights drawn in
+                    annotations=annotations if paper.status == "done" else [],
+                    pages_to_render=pages_to_render,
+                    scroll_to_page=scroll_to_page,
+                    on_annotation_click=my_custom_annotation_handler,
+                    render_text=True,
+                )
+        if paper.status == "done":
+            with marks_container:
+                marks_bar(paper)
+
+    # Persist any changes in the background
+    save_session(st.session_state)
+    track_memory()
+    metrics_panel()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,48 @@
 import streamlit as st
 import time
+from eureka.debug import metrics_panel, resume_session, track_memory
+from eureka.session import restore_session, save_session
+
+
+def adaptive_quiz(topic):
+    """Ask one question at a time, picking the most informative next question for the learner's estimated ability"""
+    from eureka.adaptive import AdaptiveQuiz
+    from eureka.analytics import session_analytics
+    from eureka.knowledge import session_knowledge
+    from eureka.quizbank import get_quiz_bank
+
+    quiz = st.session_state.get("adaptive_quiz")
+    if quiz is None or quiz.topic != topic:
+        quiz = st.session_state.adaptive_quiz = AdaptiveQuiz(get_quiz_bank(), topic)
+
+    item = quiz.next_item()
+    if item is None:
+        st.success(f"You got {sum(quiz.responses)} out of {len(quiz.asked)} correct! "
+                   f"Estimated ability: {quiz.ability:+.2f} (±{quiz.standard_error:.2f})")
+        if st.button("Restart Quiz"):
+            del st.session_state.adaptive_quiz
+            st.rerun()
+        return
+
+    q = quiz.bank.questions[item]
+    st.write(f"**Question {len(quiz.asked) + 1}:** {q['question']}")
+    answer = st.radio("Select one.", q['options'], index=None, key=f"adaptive_q{item}")
+    if st.button("Submit Answer", disabled=answer is None):
+        quiz.record(item, q['options'].index(answer) == q['correct'])
+        if quiz.done:
+            session_knowledge(st.session_state).record_quiz(topic, sum(quiz.responses), len(quiz.asked))
+            session_analytics(st.session_state).record_quiz(sum(quiz.responses) / len(quiz.asked), topic)
+            save_session(st.session_state)
+        st.rerun()
+    if quiz.asked:
+        st.caption(f"Current ability estimate: {quiz.ability:+.2f} (±{quiz.standard_error:.2f})")
 
 
 def main():
+    # Restore a returning reader's profile, chat and progress
+    restore_session(st.session_state, st.query_params)
+    resume_session()
+
     # Button to return to home
     if st.button("🏡Back to Home"):
         st.switch_page("Home.py")
@@ -16,46 +56,29 @@ def main():
          "AI History & Trends", "AI & Society"]
     
     selection = st.pills("Topics", options, selection_mode="single")
-    
+    adaptive = st.toggle("Adaptive quiz", help="Questions adapt to your answers, so fewer are needed to estimate your level.")
     
     # Display quiz after generation
-    if selection:            
+    if selection and adaptive:
+        st.subheader(f"Adaptive quiz for {selection}")
+        adaptive_quiz(selection)
+    elif selection:            
         st.subheader(f"Quiz for {selection}")
         
-        # Sample quiz questions
-        questions = [
-            {
-                "question": "Which of the following best describes how AI can create competitive advantage in business?",
-                "options": [
-                    "By replacing all human workers",
-                    "By creating new products and services through analyzing data patterns",
-                    "By automating all decision-making processes",
-                    "By increasing operational costs"
-                ],
-                "correct": 1
-            },
-            {
-                "question": "What is a key challenge of implementing AI in traditional organizations?",
-                "options": [
-                    "Technical limitations of current AI systems",
-                    "Resistance to change and cultural barriers",
-                    "High hardware costs",
-                    "Lack of use cases"
-                ],
-                "correct": 1
-            },
-            {
-                "question": "How does organizational structure typically need to change when adopting AI?",
-                "options": [
-                    "No change is necessary",
-                    "More hierarchical structures are needed",
-                    "Cross-functional teams and flatter hierarchies become more important",
-                    "Complete centralization of all decisions"
-                ],
-                "correct": 2
-            }
-        ]
+        # The quiz bank and reader models are only loaded once a topic is picked
+        from eureka.analytics import session_analytics
+        from eureka.knowledge import session_knowledge
+        from eureka.quizbank import get_quiz_bank
+
+        # Questions for the selected topic, easiest first
+        bank = get_quiz_bank()
+        question_ids = bank.by_topic(selection)
+        questions = bank.get(question_ids)
         
+        # A submitted quiz is recorded once; its answers are locked until the reader retakes it
+        submitted = st.session_state.get("quiz_result")
+        submitted = submitted if submitted is not None and submitted["topic"] == selection else None
+
         # Display questions with radio buttons
         user_answers = {}
         for i, q in enumerate(questions):
@@ -63,26 +86,40 @@ def main():
             answer = st.radio(
                 f"Select one.",
                 q['options'],
-                key=f"q{i}"
+                key=f"q{i}",
+                disabled=submitted is not None,
             )
             user_answers[i] = q['options'].index(answer)
             st.write("---")
         
         # Submit button
-        if st.button("Submit Answers"):
-            correct_count = sum(1 for q_idx, ans_idx in user_answers.items() 
-                                if ans_idx == questions[q_idx]['correct'])
-            wrong_questions = [i for i, ans in user_answers.items() if ans != questions[i]['correct']]
-            
-            st.success(f"You got {correct_count} out of {len(questions)} correct! ")
+        if st.button("Submit Answers", disabled=submitted is not None):
+            report = bank.grade(question_ids, [[user_answers[i] for i in range(len(questions))]])
+            correct_count = int(report.scores[0])
+            session_knowledge(st.session_state).record_quiz(selection, correct_count, len(questions))
+            session_analytics(st.session_state).record_quiz(correct_count / len(questions), selection)
+            submitted = st.session_state.quiz_result = {
+                "topic": selection, "correct": correct_count, "wrong": [int(w) for w in report.wrong(0)], "answers": user_answers,
+            }
+
+        if submitted is not None:
+            st.success(f"You got {submitted['correct']} out of {len(questions)} correct! ")
             # suggest for improvements based on the submitted answers
-            for wrong_question in wrong_questions:
+            for wrong_question in submitted["wrong"]:
                 st.info(f'''
                             Question {wrong_question + 1}. 
-                            Your answer: {questions[wrong_question]['options'][user_answers[wrong_question]]} |
+                            Your answer: {questions[wrong_question]['options'][submitted['answers'][wrong_question]]} |
                         Correct answer: {questions[wrong_question]['options'][questions[wrong_question]['correct']]} \n
                         Please read the following papers to see why:
                     ''')
+            if st.button("Retake Quiz"):
+                del st.session_state.quiz_result
+                st.rerun()
+
+    # Persist any changes in the background
+    save_session(st.session_state)
+    track_memory()
+    metrics_panel()
 
     # with knowledge_tabs[2]:
     #     st.subheader("Recommended Papers")